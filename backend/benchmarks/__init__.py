@@ -0,0 +1,5 @@
+"""
+Load-testing and benchmark suite for the API hot paths.
+
+Run from backend/:  python -m benchmarks --help
+"""
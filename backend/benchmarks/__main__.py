@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Seed a dataset and benchmark the API hot paths.")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db", help="Sync URL of a scratch database (it is reset unless --no-seed).")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--habits", type=int, default=20, help="Habits per user.")
+    parser.add_argument("--completions", type=int, default=365, help="Daily check-ins per habit.")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the data already in the database.")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint.")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mode", choices=["in-process", "uvicorn", "both"], default="both")
+    parser.add_argument("--scenario", action="append", help="Limit to these endpoints, e.g. 'GET /habits'.")
+    parser.add_argument("--save", help="Write results to this JSON file (use as a baseline later).")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON file.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression ratio before failing (default 10%%).")
+    return parser.parse_args()
+
+def print_table(results: dict):
+    print(f"{'mode':<11} {'endpoint':<22} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode, endpoints in results.items():
+        for name, row in endpoints.items():
+            print(f"{mode:<11} {name:<22} {row['rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}")
+
+def main():
+    args = parse_args()
+    # The engines are created at import time, so the URL must be set before importing the app
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    # Every benchmark request comes from one IP, which the login limits would throttle
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from main import app
+    from benchmarks.runner import SCENARIOS, compare, run_in_process, run_over_uvicorn
+    from benchmarks.seed import seed
+
+    if not args.no_seed:
+        print(f"Seeding {args.users} users x {args.habits} habits x {args.completions} check-ins ...")
+        seed(args.users, args.habits, args.completions)
+
+    scenarios = args.scenario or list(SCENARIOS)
+    modes = ["in-process", "uvicorn"] if args.mode == "both" else [args.mode]
+    runners = {"in-process": run_in_process, "uvicorn": run_over_uvicorn}
+    results = {mode: asyncio.run(runners[mode](app, scenarios, args.users, args.requests, args.concurrency)) for mode in modes}
+    print_table(results)
+
+    if args.save:
+        meta = {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "database": args.database_url.split("://")[0],
+            "dataset": {"users": args.users, "habits": args.habits, "completions": args.completions},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        }
+        with open(args.save, "w") as fh:
+            json.dump({"meta": meta, "results": results}, fh, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the OAuth callbacks against the local mock provider (mock_oauth.py).
+
+Run from backend/:  python -m benchmarks.oauth --latency-ms 50 --requests 300 --concurrency 10
+
+The mock runs on uvicorn over real TCP, so connection reuse counts as it would against
+Google or GitHub, and every provider request waits --latency-ms. Callbacks are driven in
+process with codes for --users distinct users, who are upserted on first login. A
+callback's p50 divided by the latency is roughly its number of sequential provider round
+trips. Run again with --no-keepalive to see what the connection pool saves.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+
+def start_mock_provider(latency: float, port: int):
+    import uvicorn
+    from mock_oauth import create_mock_provider
+
+    server = uvicorn.Server(uvicorn.Config(create_mock_provider(latency), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+async def drive(client, provider: str, users: int, requests: int, concurrency: int) -> dict:
+    from benchmarks.runner import summarize
+
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        nonlocal errors
+        params = {"code": f"mock-oauthbench{index % users}", "state": "benchmark"}
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(f"/auth/{provider}/callback", params=params)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            errors += 1
+        else:
+            latencies.append(elapsed)
+
+    # Warm up the pool (and create the users) before measuring
+    await asyncio.gather(*(one(i) for i in range(min(users, requests))))
+    latencies, errors = [], 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def run(app, providers, users, requests, concurrency) -> dict:
+    import httpx
+    from http_client import close_http_client
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", cookies={"oauth_state": "benchmark"}) as client:
+            return {provider: await drive(client, provider, users, requests, concurrency) for provider in providers}
+    finally:
+        await close_http_client()
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.oauth", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Delay the mock adds to every provider request.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=300, help="Callbacks per provider.")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--provider", action="append", choices=["github", "google"], help="Limit to these providers.")
+    parser.add_argument("--no-keepalive", action="store_true", help="Open a new provider connection for every request.")
+    args = parser.parse_args()
+
+    # Not benchmarks.runner.free_port: importing the runner would load the app before the environment is set
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # Settings and engines are read at import time, so the environment must be set before importing the app
+    os.environ.update(
+        DATABASE_URL=args.database_url, OAUTH_MOCK_URL=f"http://127.0.0.1:{port}",
+        BASE_URL="http://benchmark", FRONTEND_URL="http://frontend",
+    )
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if args.no_keepalive:
+        os.environ["HTTP_CLIENT_MAX_KEEPALIVE"] = "0"
+
+    import database
+    import models
+    from main import app
+
+    models.Base.metadata.create_all(database.engine)
+    server, thread = start_mock_provider(args.latency_ms / 1000, port)
+    try:
+        results = asyncio.run(run(app, args.provider or ["github", "google"], args.users, args.requests, args.concurrency))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    print(f"provider latency {args.latency_ms:g} ms, keep-alive {'off' if args.no_keepalive else 'on'}")
+    print(f"{'callback':<9} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'round trips':>12}")
+    for provider, row in results.items():
+        round_trips = row["p50_ms"] / args.latency_ms if args.latency_ms else 0.0
+        print(f"{provider:<9} {row['rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7} {round_trips:>12.1f}")
+
+if __name__ == "__main__":
+    main()
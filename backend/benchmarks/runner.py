@@ -0,0 +1,109 @@
+import asyncio
+import random
+import socket
+import statistics
+import threading
+import time
+import httpx
+from routes.auth_utils import create_access_token
+from benchmarks.seed import BENCH_PASSWORD, bench_username
+
+# name -> (method, path, whether the request needs a bearer token, json body factory)
+SCENARIOS = {
+    "GET /habits": ("GET", "/habits", True, None),
+    "GET /habits?limit=1000": ("GET", "/habits?limit=1000", True, None),
+    "GET /habits/streaks": ("GET", "/habits/streaks", True, None),
+    "GET /users/me": ("GET", "/users/me", True, None),
+    "POST /users/login": ("POST", "/users/login", False, lambda user: {"username": user, "password": BENCH_PASSWORD}),
+}
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+    }
+
+async def drive(client: httpx.AsyncClient, scenario: str, users: int, requests: int, concurrency: int) -> dict:
+    method, path, needs_auth, body = SCENARIOS[scenario]
+    tokens = [create_access_token(data={"sub": bench_username(i), "role": "user"}) for i in range(users)]
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(_):
+        nonlocal errors
+        index = random.randrange(users)
+        headers = {"Authorization": f"Bearer {tokens[index]}"} if needs_auth else {}
+        json = body(bench_username(index)) if body else None
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, headers=headers, json=json)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            errors += 1
+        else:
+            latencies.append(elapsed)
+
+    # Warm up pools and caches before measuring
+    await asyncio.gather(*(one(i) for i in range(min(concurrency, requests))))
+    latencies, errors = [], 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def run_in_process(app, scenarios, users, requests, concurrency) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        return {name: await drive(client, name, users, count(name, requests), concurrency) for name in scenarios}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def run_over_uvicorn(app, scenarios, users, requests, concurrency) -> dict:
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            return {name: await drive(client, name, users, count(name, requests), concurrency) for name in scenarios}
+    finally:
+        server.should_exit = True
+        thread.join()
+
+def count(scenario: str, requests: int) -> int:
+    # Every login costs a full bcrypt round, so sample it less
+    return max(1, requests // 20) if scenario == "POST /users/login" else requests
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return a message for every endpoint whose p95 or throughput regressed beyond `threshold`."""
+    regressions = []
+    for mode, endpoints in results.items():
+        for name, current in endpoints.items():
+            previous = baseline.get(mode, {}).get(name)
+            if not previous:
+                continue
+            if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append(f"{mode} {name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            if previous["rps"] and current["rps"] < previous["rps"] * (1 - threshold):
+                regressions.append(f"{mode} {name}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from database import Base, engine, SessionLocal
+from models import User, Habit, HabitCompletion
+from routes.auth_utils import get_password_hash
+from streaks import rebuild_stats
+
+BENCH_PASSWORD = "benchmark-password"
+BATCH_SIZE = 5000
+
+def bench_username(index: int) -> str:
+    return f"bench_user_{index}"
+
+def seed(users: int, habits: int, completions: int, reset: bool = True):
+    """Create `users` x `habits` habits, each with `completions` consecutive daily check-ins."""
+    if reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    # bcrypt is deliberately slow, so every seeded user shares one hash
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    today = datetime.utcnow().date()
+
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"username": bench_username(i), "password": password_hash, "role": "user"} for i in range(users)
+        ])
+        user_ids = [row.id for row in db.query(User.id).order_by(User.id)]
+
+        habit_rows = [
+            {"title": f"Habit {h}", "description": "Seeded for benchmarks", "frequency": "daily", "user_id": user_id}
+            for user_id in user_ids for h in range(habits)
+        ]
+        for start in range(0, len(habit_rows), BATCH_SIZE):
+            db.execute(insert(Habit), habit_rows[start:start + BATCH_SIZE])
+
+        batch = []
+        for (habit_id,) in db.query(Habit.id).order_by(Habit.id):
+            batch.extend({"habit_id": habit_id, "day": today - timedelta(days=d)} for d in range(completions))
+            if len(batch) >= BATCH_SIZE:
+                db.execute(insert(HabitCompletion), batch)
+                batch = []
+        if batch:
+            db.execute(insert(HabitCompletion), batch)
+        db.commit()
+
+        rebuild_stats(db)
+    return user_ids
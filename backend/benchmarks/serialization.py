@@ -0,0 +1,81 @@
+"""
+Compare the ORM + response_model path with the plain-row + orjson path for a large habit list.
+
+Run from backend/:  python -m benchmarks.serialization --rows 1000 --repeat 50
+
+Both paths read the same habits from an in-memory SQLite database. "orm" is what FastAPI did
+before: load Habit entities (stats joined), validate them through list[HabitResponse] with
+from_attributes, dump to JSON-able Python and encode with the json module. "rows" is what
+GET /habits does now: select plain columns, build dicts and encode with orjson.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import date, datetime, timedelta
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from database import Base
+from models import Habit, HabitStats, User
+from routes.habits import habit_list_query, habit_to_dict
+from schemas import HabitResponse
+
+legacy_adapter = TypeAdapter(list[HabitResponse])
+
+def seed(session: Session, rows: int):
+    session.add(User(id=1, username="bench", password="x", role="user"))
+    session.execute(insert(Habit), [
+        {"id": i, "user_id": 1, "title": f"Habit number {i}", "description": "A reasonably long description " * 3,
+         "frequency": "daily", "created_at": datetime(2024, 1, 1) + timedelta(minutes=i)}
+        for i in range(1, rows + 1)
+    ])
+    session.execute(insert(HabitStats), [
+        {"habit_id": i, "current_streak": i % 30, "longest_streak": i % 90, "total_completions": i,
+         "last_completed_on": date.today() - timedelta(days=i % 3)}
+        for i in range(1, rows + 1)
+    ])
+    session.commit()
+
+def orm_path(session: Session) -> bytes:
+    habits = session.execute(select(Habit).where(Habit.user_id == 1).order_by(Habit.id)).unique().scalars().all()
+    content = legacy_adapter.dump_python(legacy_adapter.validate_python(habits, from_attributes=True), mode="json")
+    session.expunge_all()
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def rows_path(session: Session) -> bytes:
+    query = habit_list_query("id").where(Habit.user_id == 1).order_by(Habit.id)
+    today = datetime.utcnow().date()
+    return orjson.dumps([habit_to_dict(row, today) for row in session.execute(query)])
+
+def measure(func, session: Session, repeat: int) -> list:
+    func(session)  # warm up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(session)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, args.rows)
+        if json.loads(orm_path(session)) != json.loads(rows_path(session)):
+            raise SystemExit("The two paths produced different JSON")
+        results = {name: measure(func, session, args.repeat) for name, func in (("orm", orm_path), ("rows", rows_path))}
+
+    print(f"{'path':<6} {'p50 ms':>9} {'mean ms':>9}   ({args.rows} habits, {args.repeat} runs)")
+    for name, timings in results.items():
+        print(f"{name:<6} {statistics.median(timings) * 1000:>9.2f} {statistics.fmean(timings) * 1000:>9.2f}")
+    print(f"speedup: {statistics.median(results['orm']) / statistics.median(results['rows']):.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Measure what one worker pays to start: import time and resident memory of `main`.
+
+Run from backend/:  python -m benchmarks.startup --repeat 5 --top 15
+
+Every run imports the app in a fresh interpreter, like a new worker. It reports the import
+time, RSS after the import and after `warm_up()`, and the slowest modules by cumulative
+import time (from `python -X importtime`). Save a run with --save and pass it back with
+--baseline to compare.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+after_import = rss_mb()
+from warmup import warm_up
+asyncio.run(warm_up())
+print(json.dumps({
+    "import_ms": imported * 1000,
+    "rss_import_mb": after_import,
+    "rss_warm_mb": rss_mb(),
+    "modules": len(sys.modules),
+}))
+"""
+
+def run_probe(env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def slowest_imports(env: dict, top: int) -> list:
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], env=env, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only what main imports directly (one indent level), so nothing is counted twice
+        if name.startswith("   ") and not name.startswith("     "):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to list.")
+    parser.add_argument("--save", help="Write the summary to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON file.")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url, REMINDER_SCHEDULER_ENABLED="false", ROLLUP_JOB_ENABLED="false")
+    env.pop("ASYNC_DATABASE_URL", None)
+    runs = [run_probe(env) for _ in range(args.repeat)]
+    summary = {
+        "import_ms": statistics.median(run["import_ms"] for run in runs),
+        "rss_import_mb": statistics.median(run["rss_import_mb"] for run in runs),
+        "rss_warm_mb": statistics.median(run["rss_warm_mb"] for run in runs),
+        "modules": runs[-1]["modules"],
+    }
+
+    print(f"import main    {summary['import_ms']:>8.0f} ms   (median of {args.repeat})")
+    print(f"RSS imported   {summary['rss_import_mb']:>8.1f} MB")
+    print(f"RSS warmed up  {summary['rss_warm_mb']:>8.1f} MB")
+    print(f"modules        {summary['modules']:>8}")
+    print(f"\n{'cumulative ms':>13}  top-level import")
+    for cumulative, name in slowest_imports(env, args.top):
+        print(f"{cumulative:>13.1f}  {name}")
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(summary, fh, indent=2)
+        print(f"\nSaved results to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        print(f"\n{'metric':<14} {'baseline':>9} {'now':>9} {'change':>8}")
+        for key in ("import_ms", "rss_import_mb", "rss_warm_mb", "modules"):
+            change = (summary[key] - baseline[key]) / baseline[key] if baseline[key] else 0.0
+            print(f"{key:<14} {baseline[key]:>9.1f} {summary[key]:>9.1f} {change:>+8.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+
+class CacheBackend:
+    """Interface for cache backends. Subclass this to add a shared cache (e.g. Redis)."""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+class InMemoryCache(CacheBackend):
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "max_size": self.max_size, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Snapshot of the User columns handlers read from `current_user` (never the password hash)."""
+    id: int
+    username: str
+    role: str
+
+    @classmethod
+    def from_orm(cls, user):
+        return cls(id=user.id, username=user.username, role=user.role)
+
+# Resolved users keyed by the token subject (username)
+user_cache: CacheBackend = InMemoryCache(max_size=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
+
+def set_user_cache_backend(backend: CacheBackend):
+    global user_cache
+    user_cache = backend
+
+def get_cached_user(username: str) -> Optional[CachedUser]:
+    return user_cache.get(username)
+
+def cache_user(user) -> CachedUser:
+    cached = CachedUser.from_orm(user)
+    user_cache.set(cached.username, cached)
+    return cached
+
+def invalidate_user(username: str):
+    user_cache.delete(username)
+
+def user_cache_stats() -> dict:
+    return user_cache.stats()
+
+def user_cache_samples() -> list:
+    stats = user_cache.stats()
+    return [
+        ("user_cache_hits_total", "counter", "User cache hits.", stats["hits"]),
+        ("user_cache_misses_total", "counter", "User cache misses.", stats["misses"]),
+        ("user_cache_size", "gauge", "Users currently cached.", stats["size"]),
+    ]
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Literal
+from fastapi.responses import StreamingResponse
+from database import AsyncSessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def encode_ndjson(columns, rows) -> str:
+    return "".join(json.dumps(dict(zip(columns, map(encode_value, row))), separators=(",", ":")) + "\n" for row in rows)
+
+def encode_csv(columns, rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([[encode_value(value) for value in row] for row in rows])
+    return buffer.getvalue()
+
+async def stream_rows(query, columns, fmt: ExportFormat):
+    """
+    Yield encoded chunks of `query` one server-side batch at a time, so memory stays flat.
+
+    The session is opened here rather than taken from `get_async_db`, because FastAPI closes
+    yield dependencies before a StreamingResponse body is sent.
+    """
+    encode = encode_ndjson if fmt == "ndjson" else encode_csv
+    if fmt == "csv":
+        yield encode_csv(columns, [columns])
+
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield encode(columns, rows)
+
+def export_response(query, columns, fmt: ExportFormat, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(query, columns, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
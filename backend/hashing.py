@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from database import AsyncSessionLocal
+from models import User
+from routes.auth_utils import pwd_context
+
+logger = logging.getLogger(__name__)
+
+# bcrypt releases the GIL, so a thread pool gives real parallelism
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", 32))
+
+# Stored for accounts created by a social login; no password ever verifies against it
+UNUSABLE_PASSWORD = "!"
+
+class HashingPool:
+    """Bounded executor for password hashing with latency and queue-wait metrics."""
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash")
+        return self._executor
+
+    def _timed(self, func, submitted, args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self._record(started - submitted, time.perf_counter() - started)
+
+    def _record(self, wait, elapsed):
+        with self._lock:
+            self.completed += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self.hash_seconds_total += elapsed
+            self.hash_seconds_max = max(self.hash_seconds_max, elapsed)
+
+    async def run(self, func, *args):
+        # Shed load instead of queueing without bound
+        if self.in_flight >= self.workers + self.queue_depth:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._timed, func, time.perf_counter(), args)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "hash_seconds_avg": self.hash_seconds_total / completed,
+                "hash_seconds_max": self.hash_seconds_max,
+                "queue_wait_seconds_avg": self.wait_seconds_total / completed,
+                "queue_wait_seconds_max": self.wait_seconds_max,
+            }
+
+    def samples(self):
+        with self._lock:
+            return [
+                ("password_hash_in_flight", "gauge", "Hashing jobs running or queued.", self.in_flight),
+                ("password_hash_rejected_total", "counter", "Hashing jobs rejected because the queue was full.", self.rejected),
+                ("password_hash_completed_total", "counter", "Hashing jobs completed.", self.completed),
+                ("password_hash_seconds_total", "counter", "Time spent hashing.", self.hash_seconds_total),
+                ("password_hash_queue_wait_seconds_total", "counter", "Time jobs waited for a worker.", self.wait_seconds_total),
+            ]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+hashing_pool = HashingPool(HASH_WORKERS, HASH_QUEUE_DEPTH)
+
+async def hash_password(password: str) -> str:
+    return await hashing_pool.run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if hashed_password == UNUSABLE_PASSWORD:
+        return False
+    return await hashing_pool.run(pwd_context.verify, plain_password, hashed_password)
+
+def needs_rehash(hashed_password: str) -> bool:
+    if hashed_password == UNUSABLE_PASSWORD:
+        return False
+    return pwd_context.needs_update(hashed_password)
+
+# Background task: upgrade a deprecated hash after a successful login
+async def rehash_password(user_id: int, password: str):
+    try:
+        new_hash = await hash_password(password)
+    except HTTPException:
+        logger.info("Skipping rehash for user %s, hashing pool is busy", user_id)
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(User).where(User.id == user_id).values(password=new_hash))
+        await db.commit()
@@ -0,0 +1,106 @@
+"""
+One pooled HTTP client for outbound calls: the OAuth providers and the reminder webhook.
+
+Connections are kept alive and reused across requests, and every request has connect and
+read timeouts. `request` retries transient failures with exponential backoff and full
+jitter. Connection failures are retried for any method, since nothing was sent. Read
+timeouts and 429/502/503/504 responses are retried for GET/HEAD only. The client itself is
+created on first use.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+import httpx
+from metrics import CounterMetric, Histogram
+
+logger = logging.getLogger(__name__)
+
+HTTP_CLIENT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CLIENT_TIMEOUT_SECONDS", 10))
+HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS", 3))
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", 100))
+HTTP_CLIENT_MAX_KEEPALIVE = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", 20))
+HTTP_CLIENT_KEEPALIVE_SECONDS = float(os.getenv("HTTP_CLIENT_KEEPALIVE_SECONDS", 30))
+HTTP_CLIENT_RETRIES = int(os.getenv("HTTP_CLIENT_RETRIES", 2))
+HTTP_CLIENT_BACKOFF_SECONDS = float(os.getenv("HTTP_CLIENT_BACKOFF_SECONDS", 0.2))
+HTTP_CLIENT_MAX_BACKOFF_SECONDS = float(os.getenv("HTTP_CLIENT_MAX_BACKOFF_SECONDS", 2))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+OUTBOUND_LATENCY = Histogram("http_client_request_seconds", "Outbound HTTP request latency, per attempt.", ("host", "outcome"))
+OUTBOUND_RETRIES = CounterMetric("http_client_retries_total", "Outbound HTTP requests retried after a transient failure.", ("host",))
+
+_client = None
+_transport = None
+
+def set_http_transport(transport):
+    """Send outbound requests through `transport`, e.g. httpx.ASGITransport(app=...) in tests."""
+    global _client, _transport
+    _transport, _client = transport, None
+
+def get_http_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_CLIENT_TIMEOUT_SECONDS, connect=HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_CLIENT_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_CLIENT_KEEPALIVE_SECONDS,
+            ),
+            transport=_transport,
+        )
+    return _client
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    if retry_after is not None:
+        return min(retry_after, HTTP_CLIENT_MAX_BACKOFF_SECONDS)
+    return random.uniform(0, min(HTTP_CLIENT_MAX_BACKOFF_SECONDS, HTTP_CLIENT_BACKOFF_SECONDS * 2 ** attempt))
+
+def retry_after_seconds(response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+async def request(method: str, url: str, retries: int = HTTP_CLIENT_RETRIES, **kwargs):
+    """client.request() with retries; the last response is returned, the last transport error raised."""
+    client = get_http_client()
+    host = urlsplit(url).hostname
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        response = error = None
+        try:
+            response = await client.request(method, url, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+            error, retryable = exc, True
+        except httpx.TransportError as exc:
+            error, retryable = exc, idempotent
+        else:
+            retryable = idempotent and response.status_code in RETRY_STATUSES
+        outcome = type(error).__name__ if error else f"{response.status_code // 100}xx"
+        OUTBOUND_LATENCY.observe(time.perf_counter() - started, host, outcome)
+
+        if not retryable or attempt >= retries:
+            if error is not None:
+                raise error
+            return response
+        delay = backoff_delay(attempt, retry_after_seconds(response) if response is not None else None)
+        if response is not None:
+            await response.aclose()
+        OUTBOUND_RETRIES.inc(host)
+        logger.info("Retrying %s %s in %.2fs after %s", method, host, delay, outcome)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
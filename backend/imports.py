@@ -0,0 +1,317 @@
+"""
+Bulk import of habits and their check-in history from CSV or NDJSON.
+
+    python -m imports history.csv --user alice [--format csv] [--batch-size 10000]
+
+POST /imports (routes/imports.py) runs the same pipeline in the background:
+
+1. The file is read as a stream, IMPORT_BATCH_SIZE rows at a time, so memory stays flat
+   whatever the file size.
+2. Each row is validated with schemas.HabitImportRow, which is HabitCreate plus
+   external_id, created_at, day/completions and username. Invalid rows are counted and the
+   first IMPORT_MAX_ERRORS are kept with their line number.
+3. Valid rows are bulk-loaded into the staging tables: COPY on PostgreSQL (psycopg2),
+   executemany elsewhere. Each batch is committed and the job row shows the progress.
+4. One transaction merges the staging rows. A habit is created once per (owner,
+   external_id), and external_id defaults to the title. A check-in is created once per
+   (habit, day). Stats are recomputed for every habit in the file, and their owners' habit
+   ETags change. Importing the same file again creates nothing.
+
+CSV columns: title, description, frequency, external_id, created_at, day, completions (days
+separated by ";") and username. NDJSON objects use the same keys, with `completions` as a
+list. `username` assigns a row to another user. Only admins and the CLI may use it.
+"""
+import argparse
+import csv
+import io
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Optional
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import DateTime, and_, delete, false, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from database import SessionLocal
+from models import Habit, HabitCompletion, ImportCompletionRow, ImportHabitRow, ImportJob, ImportRowError, User
+from schemas import HabitImportRow
+from streaks import REBUILD_BATCH_SIZE, rebuild_batch
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 10000))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+
+FORMATS = ("csv", "ndjson")
+
+def detect_format(filename: Optional[str]) -> str:
+    if filename and filename.lower().endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+# -----------------------------
+# Reading
+# -----------------------------
+def read_rows(stream, fmt: str):
+    """Yield (line number, record dict or error message) from a binary stream."""
+    if fmt == "ndjson":
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as exc:
+                yield line_number, f"Invalid JSON: {exc}"
+                continue
+            yield line_number, record if isinstance(record, dict) else "Expected a JSON object"
+        return
+
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for record in reader:
+        # An empty cell means "not given", so the schema defaults apply
+        record = {key: value for key, value in record.items() if key and value not in ("", None)}
+        if "completions" in record:
+            record["completions"] = [day.strip() for day in record["completions"].split(";") if day.strip()]
+        yield reader.line_num, record
+
+def describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc'])) or 'row'}: {item['msg']}" for item in error.errors())
+
+# -----------------------------
+# Staging and merging
+# -----------------------------
+def stage_rows(db, model, rows: list):
+    """Bulk-load rows into a staging table: COPY with psycopg2, executemany otherwise."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect
+    if dialect.name != "postgresql" or dialect.driver != "psycopg2":
+        # Core insert on the table: executemany without the ORM's per-row bookkeeping
+        db.execute(model.__table__.insert(), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    # In COPY's CSV format an unquoted empty field is NULL, which is how csv writes None
+    csv.writer(buffer).writerows([row[column] for column in columns] for row in rows)
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def insert_ignoring_duplicates(db, model, columns: list, source):
+    """INSERT ... SELECT that skips rows violating a unique index (ON CONFLICT DO NOTHING)."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).from_select(columns, source).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).from_select(columns, source).on_conflict_do_nothing()
+    return insert(model).from_select(columns, source)
+
+class Importer:
+    """Runs one ImportJob: validate and stage batches, then merge them in one transaction."""
+
+    def __init__(self, db, job: ImportJob, allow_usernames: bool = False, batch_size: int = IMPORT_BATCH_SIZE,
+                 max_errors: int = IMPORT_MAX_ERRORS, progress: Optional[Callable] = None):
+        self.db = db
+        self.job = job
+        self.allow_usernames = allow_usernames
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.progress = progress
+        self.owner_id = job.user_id
+        self.owner_name = db.execute(select(User.username).where(User.id == job.user_id)).scalar()
+        self.user_ids = {self.owner_name: self.owner_id}
+        self.errors_kept = 0
+
+    def run(self, stream) -> ImportJob:
+        db, job = self.db, self.job
+        try:
+            job.status = "staging"
+            db.commit()
+            batch = []
+            for line, record in read_rows(stream, job.format):
+                batch.append((line, record))
+                if len(batch) >= self.batch_size:
+                    self.stage(batch)
+                    batch = []
+            if batch:
+                self.stage(batch)
+            job.status = "merging"
+            db.commit()
+            self.merge()
+            job.status = "done"
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Import %s failed", job.id)
+            job.status = "failed"
+            job.message = str(exc)[:500]
+        # Staged rows are only needed until the merge, whatever its outcome
+        db.execute(delete(ImportHabitRow).where(ImportHabitRow.job_id == job.id))
+        db.execute(delete(ImportCompletionRow).where(ImportCompletionRow.job_id == job.id))
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        if self.progress:
+            self.progress(job)
+        return job
+
+    def resolve_usernames(self, batch):
+        names = {record.get("username") for _, record in batch if isinstance(record, dict)}
+        missing = [name for name in names if isinstance(name, str) and name not in self.user_ids]
+        if missing:
+            found = dict(self.db.execute(select(User.username, User.id).where(User.username.in_(missing))).all())
+            self.user_ids.update({name: found.get(name) for name in missing})
+
+    def stage(self, batch):
+        if self.allow_usernames:
+            self.resolve_usernames(batch)
+        habits, completions, errors = [], [], []
+        for line, record in batch:
+            if isinstance(record, str):
+                errors.append((line, record))
+                continue
+            try:
+                row = HabitImportRow.model_validate(record)
+            except ValidationError as exc:
+                errors.append((line, describe(exc)))
+                continue
+            user_id = self.owner_id
+            if row.username is not None and row.username != self.owner_name:
+                if not self.allow_usernames:
+                    errors.append((line, "username: only admins can import habits for other users"))
+                    continue
+                user_id = self.user_ids.get(row.username)
+                if user_id is None:
+                    errors.append((line, f"username: unknown user {row.username}"))
+                    continue
+
+            external_id = row.external_id or row.title
+            habits.append({
+                "job_id": self.job.id, "line": line, "user_id": user_id, "external_id": external_id,
+                "title": row.title, "description": row.description, "frequency": row.frequency or "daily",
+                "created_at": row.created_at,
+            })
+            days = set(row.completions)
+            if row.day is not None:
+                days.add(row.day)
+            completions.extend(
+                {"job_id": self.job.id, "line": line, "day": day, "user_id": user_id, "external_id": external_id}
+                for day in sorted(days)
+            )
+
+        stage_rows(self.db, ImportHabitRow, habits)
+        stage_rows(self.db, ImportCompletionRow, completions)
+        kept = errors[:max(0, self.max_errors - self.errors_kept)]
+        if kept:
+            self.db.execute(insert(ImportRowError), [{"job_id": self.job.id, "line": line, "error": error[:500]} for line, error in kept])
+            self.errors_kept += len(kept)
+        self.job.rows_read += len(batch)
+        self.job.rows_failed += len(errors)
+        self.db.commit()
+        if self.progress:
+            self.progress(self.job)
+
+    def merge(self):
+        db, job_id, now = self.db, self.job.id, datetime.utcnow()
+
+        # Habits: the first staged line of each (user, external_id) supplies the fields
+        staged = ImportHabitRow
+        first = (
+            select(staged.user_id, staged.external_id, func.min(staged.line).label("line"))
+            .where(staged.job_id == job_id)
+            .group_by(staged.user_id, staged.external_id)
+            .subquery()
+        )
+        source = (
+            select(
+                staged.user_id, staged.external_id, staged.title, staged.description, staged.frequency,
+                func.coalesce(staged.created_at, literal(now, DateTime)), literal(now, DateTime), false(),
+            )
+            .join(first, and_(staged.user_id == first.c.user_id, staged.external_id == first.c.external_id, staged.line == first.c.line))
+            .where(staged.job_id == job_id)
+        )
+        columns = ["user_id", "external_id", "title", "description", "frequency", "created_at", "updated_at", "completed"]
+        self.job.habits_created = db.execute(insert_ignoring_duplicates(db, Habit, columns, source)).rowcount
+
+        # Check-ins: matched to habits on (user, external_id), whether new or imported earlier
+        staged = ImportCompletionRow
+        source = (
+            select(Habit.id, staged.day, literal(now, DateTime))
+            .join(Habit, and_(Habit.user_id == staged.user_id, Habit.external_id == staged.external_id))
+            .where(staged.job_id == job_id)
+            .group_by(Habit.id, staged.day)
+        )
+        self.job.completions_created = db.execute(
+            insert_ignoring_duplicates(db, HabitCompletion, ["habit_id", "day", "created_at"], source)
+        ).rowcount
+
+        # Every habit in the file, so one imported without check-ins gets (empty) stats too
+        staged = ImportHabitRow
+        habit_ids = db.execute(
+            select(Habit.id)
+            .join(staged, and_(Habit.user_id == staged.user_id, Habit.external_id == staged.external_id))
+            .where(staged.job_id == job_id)
+            .distinct()
+        ).scalars().all()
+        for start in range(0, len(habit_ids), REBUILD_BATCH_SIZE):
+            rebuild_batch(db, habit_ids[start:start + REBUILD_BATCH_SIZE])
+
+        # Invalidate the owners' habit ETags (see routes/habits.py); keep users.updated_at
+        user_ids = select(ImportHabitRow.user_id).where(ImportHabitRow.job_id == job_id).distinct()
+        db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(habits_version=User.habits_version + 1, updated_at=User.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+def create_job(db, user_id: int, fmt: str, filename: Optional[str] = None) -> ImportJob:
+    job = ImportJob(user_id=user_id, format=fmt, filename=filename, status="pending")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def run_import_file(job_id: int, path: str, allow_usernames: bool = False):
+    """Background task for POST /imports: import an uploaded file, then delete it."""
+    try:
+        with SessionLocal() as db, open(path, "rb") as stream:
+            Importer(db, db.get(ImportJob, job_id), allow_usernames).run(stream)
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m imports", description="Import habits and check-ins from CSV or NDJSON.")
+    parser.add_argument("path", help="File to import, or - for stdin.")
+    parser.add_argument("--user", required=True, help="Owner of rows without a username column.")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to ndjson for .ndjson/.jsonl/.json files, csv otherwise.")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    def report(job: ImportJob):
+        elapsed = time.perf_counter() - started
+        print(f"\r{job.status:<8} {job.rows_read:>10} rows read, {job.rows_failed} failed, {job.rows_read / elapsed if elapsed else 0:,.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+    with SessionLocal() as db:
+        user_id = db.execute(select(User.id).where(User.username == args.user)).scalar()
+        if user_id is None:
+            raise SystemExit(f"Unknown user: {args.user}")
+        fmt = args.format or detect_format(None if args.path == "-" else args.path)
+        job = create_job(db, user_id, fmt, None if args.path == "-" else os.path.basename(args.path))
+        stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+        with stream:
+            job = Importer(db, job, allow_usernames=True, batch_size=args.batch_size, progress=report).run(stream)
+        print(file=sys.stderr)
+        print(f"Import {job.id} {job.status} in {time.perf_counter() - started:.1f}s: {job.rows_read} rows, {job.rows_failed} failed, "
+              f"{job.habits_created} habits and {job.completions_created} check-ins created")
+        if job.message:
+            print(job.message)
+        for error in db.execute(select(ImportRowError).where(ImportRowError.job_id == job.id).order_by(ImportRowError.id).limit(20)).scalars():
+            print(f"  line {error.line}: {error.error}")
+        raise SystemExit(0 if job.status == "done" else 1)
@@ -0,0 +1,68 @@
+"""
+Fail when a router queries a table without being able to use an index.
+
+For every function in the router modules, collect the `Model.column` references inside
+`.where(...)`, `.filter(...)` and `.join(...)` calls. Per table, at least one of the filtered
+columns must be the leading column of an index (primary keys and unique columns count).
+Other filtered columns are treated as residual filters on the indexed range.
+
+Usage: python index_check.py [paths...]   (defaults to routes/*.py)
+"""
+import ast
+import glob
+import sys
+from collections import defaultdict
+from database import Base
+import models  # noqa: F401  (registers the mappers)
+
+FILTER_METHODS = {"where", "filter", "join", "outerjoin"}
+
+def leading_indexed_columns() -> dict:
+    leading = defaultdict(set)
+    for table in Base.metadata.tables.values():
+        leading[table.name].update(column.name for column in table.primary_key.columns[:1])
+        for index in table.indexes:
+            leading[table.name].add(index.columns.values()[0].name)
+        for column in table.columns:
+            if column.unique:
+                leading[table.name].add(column.name)
+    return leading
+
+def model_tables() -> dict:
+    return {mapper.class_.__name__: mapper.local_table for mapper in Base.registry.mappers}
+
+def filtered_columns(node, tables):
+    """Yield (table_name, column_name) for every Model.column referenced under `node`."""
+    for child in ast.walk(node):
+        if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name) and child.value.id in tables:
+            table = tables[child.value.id]
+            if child.attr in table.columns:
+                yield table.name, child.attr
+
+def check_file(path, tables, leading) -> list:
+    problems = []
+    tree = ast.parse(open(path).read(), filename=path)
+    for func in ast.walk(tree):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        used = defaultdict(set)
+        for call in ast.walk(func):
+            if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr in FILTER_METHODS:
+                for arg in call.args:
+                    for table_name, column_name in filtered_columns(arg, tables):
+                        used[table_name].add(column_name)
+        for table_name, columns in used.items():
+            if not columns & leading[table_name]:
+                problems.append(f"{path}:{func.lineno} {func.name}() filters {table_name} on {sorted(columns)} with no usable index")
+    return problems
+
+def main(paths) -> int:
+    tables, leading = model_tables(), leading_indexed_columns()
+    problems = [problem for path in paths for problem in check_file(path, tables, leading)]
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} unindexed filter(s) found" if problems else "All router filters are covered by an index")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:] or sorted(glob.glob("routes/*.py"))))
@@ -1,25 +1,31 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from starlette.middleware.sessions import SessionMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from authlib.integrations.starlette_client import OAuth
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 import os
 import logging
-from dotenv import load_dotenv
+import settings
+from settings import ACCESS_TOKEN_EXPIRE_MINUTES, JWT_ALGORITHM, JWT_SECRET
 from routes.auth import router as auth_router
 from routes.users import router as users_router
 from routes.habits import router as habits_router
-
-# Load environment variables
-load_dotenv()
-
-# Ensure JWT Secret Key is Loaded
-JWT_SECRET = os.getenv("JWT_SECRET_KEY")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+from routes.reminders import router as reminders_router
+from routes.analytics import router as analytics_router
+from routes.imports import router as imports_router
+from database import engine, async_engine, replica_engines
+from hashing import hashing_pool
+from cache import user_cache_samples
+from revocation import revocation_store
+from routes.auth_utils import decode_token
+from metrics import METRICS, MetricsMiddleware, collectors, render_metrics
+from scheduler import REMINDER_LAG, REMINDER_SCHEDULER_ENABLED, reminder_scheduler
+from rollups import ROLLUP_JOB_ENABLED, rollup_job
+from ratelimit import RATE_LIMITED, RateLimitMiddleware, rate_limit_samples
+from static_assets import StaticAssets
+from replicas import replica_router
+from http_client import OUTBOUND_LATENCY, OUTBOUND_RETRIES, close_http_client
+from warmup import warm_up
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -30,31 +36,39 @@ app = FastAPI(
     title="Habit Tracker API",
     version="1.0",
     description="A FastAPI backend for tracking habits with OAuth and JWT authentication.",
-    redirect_slashes=False
-)
-
-# Add SessionMiddleware (only once with the desired configuration)
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=os.getenv("SESSION_SECRET", "your_secure_session_secret"),
-    session_cookie="oauth_session",
-    same_site="lax"
+    redirect_slashes=False,
+    default_response_class=ORJSONResponse,
 )
 
 # Include routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(users_router, prefix="/users", tags=["Users"])
 app.include_router(habits_router, prefix="/habits", tags=["Habits"])
+app.include_router(reminders_router, prefix="/reminders", tags=["Reminders"])
+app.include_router(analytics_router, prefix="/analytics", tags=["Analytics"])
+app.include_router(imports_router, prefix="/imports", tags=["Imports"])
+
+# Token-bucket limits on login, register and write routes (inside CORS, so 429s carry CORS headers)
+app.add_middleware(RateLimitMiddleware)
 
 # CORS Middleware (Allow frontend communication)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:5173").split(","),
+    allow_origins=settings.CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor", "ETag", "Server-Timing", "Retry-After",
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy",
+    ],
 )
 
+# Request latency and SQL instrumentation (outermost, so it times everything above)
+app.add_middleware(MetricsMiddleware)
+METRICS.extend([REMINDER_LAG, RATE_LIMITED, OUTBOUND_LATENCY, OUTBOUND_RETRIES])
+collectors.extend([user_cache_samples, hashing_pool.samples, revocation_store.samples, reminder_scheduler.samples, rollup_job.samples, rate_limit_samples, replica_router.samples])
+
 # Function to create JWT token
 def create_jwt_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -65,24 +79,54 @@ def create_jwt_token(data: dict, expires_delta: timedelta = None):
 # Function to verify JWT token
 def verify_jwt_token(token: str):
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decode_token(token, JWT_SECRET, JWT_ALGORITHM)
         return payload  # Token is valid
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+# Open pool connections and load bcrypt before traffic arrives (see warmup.py for pre-fork hooks)
+@app.on_event("startup")
+async def warm_up_worker():
+    await warm_up()
+
+# Background loops (disable per process with REMINDER_SCHEDULER_ENABLED / ROLLUP_JOB_ENABLED)
+@app.on_event("startup")
+async def start_background_jobs():
+    if REMINDER_SCHEDULER_ENABLED:
+        reminder_scheduler.start()
+    if ROLLUP_JOB_ENABLED:
+        rollup_job.start()
+
+# Release pooled connections (database and outbound HTTP) on shutdown
+@app.on_event("shutdown")
+async def dispose_engines():
+    await reminder_scheduler.stop()
+    await rollup_job.stop()
+    await async_engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+    engine.dispose()
+    hashing_pool.shutdown()
+    await close_http_client()
+
 # Health check endpoint for production readiness
 @app.get("/health", tags=["Health"], summary="Health Check")
 async def health_check():
     return {"status": "ok"}
 
-# Serve frontend if it exists
+# Prometheus metrics
+@app.get("/metrics", tags=["Health"], summary="Prometheus metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Serve frontend if it exists (loaded into memory with gzip/brotli variants at startup)
 frontend_path = os.path.join(os.path.dirname(__file__), "frontend")
-if os.path.exists(frontend_path):
-    app.mount("/frontend", StaticFiles(directory=frontend_path, html=True), name="frontend")
+frontend = StaticAssets(frontend_path) if os.path.exists(frontend_path) else None
+if frontend is not None:
+    app.mount("/frontend", frontend, name="frontend")
 
 @app.get("/", include_in_schema=False)
-async def serve_vue():
-    index_path = os.path.join(frontend_path, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
+async def serve_vue(request: Request):
+    if frontend is not None and "index.html" in frontend.assets:
+        return frontend.response("index.html", request.method, request.headers)
     return {"error": "Frontend build not found. Run npm run build."}
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+PROFILE_SLOW_REQUESTS = os.getenv("PROFILE_SLOW_REQUESTS", "false").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# -----------------------------
+# Minimal Prometheus-style metric types
+# -----------------------------
+def format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self._series = defaultdict(lambda: [[0] * (len(self.buckets) + 1), 0.0, 0])
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            counts, _, _ = series = self._series[label_values]
+            counts[bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    labels = format_labels(self.labels + ("le",), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class CounterMetric:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines.extend(f"{self.name}{format_labels(self.labels, values)} {value}" for values, value in self._values.items())
+        return lines
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Total request latency.", ("method", "route", "status"))
+REQUEST_STATEMENTS = Histogram("http_request_db_statements", "SQL statements executed per request.", ("route",), COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Time spent in SQL per request.", ("route",))
+STATEMENT_LATENCY = Histogram("db_statement_duration_seconds", "Latency of individual SQL statements.")
+N_PLUS_ONE = CounterMetric("http_request_n_plus_one_total", "Requests that repeated one SQL statement N_PLUS_ONE_THRESHOLD+ times.", ("route",))
+SLOW_REQUESTS = CounterMetric("http_request_slow_total", "Requests slower than SLOW_REQUEST_MS.", ("route",))
+
+METRICS = [REQUEST_LATENCY, REQUEST_STATEMENTS, REQUEST_DB_TIME, STATEMENT_LATENCY, N_PLUS_ONE, SLOW_REQUESTS]
+
+# Callables returning extra (name, type, help, value) samples, e.g. cache and hashing pool stats
+collectors = []
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collect in collectors:
+        for name, kind, help, value in collect():
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
+
+# -----------------------------
+# Per-request SQL statistics
+# -----------------------------
+class RequestStats:
+    __slots__ = ("statements", "db_time", "slowest", "slowest_time", "counts")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest = None
+        self.slowest_time = 0.0
+        self.counts = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.db_time += elapsed
+        self.counts[statement] += 1
+        if elapsed > self.slowest_time:
+            self.slowest, self.slowest_time = statement, elapsed
+
+    def repeated_statements(self) -> list:
+        return [(statement, count) for statement, count in self.counts.items() if count >= N_PLUS_ONE_THRESHOLD]
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    STATEMENT_LATENCY.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+def instrument_engine(sync_engine):
+    """Attach the timing hooks to an Engine (pass `async_engine.sync_engine` for async engines)."""
+    if not event.contains(sync_engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+# -----------------------------
+# Opt-in sampling profiler for slow requests
+# -----------------------------
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack every PROFILE_INTERVAL_MS and files each sample
+    under the asyncio task that was running. Only requests that end up slower than
+    SLOW_REQUEST_MS have their samples logged, as collapsed stacks.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = {}
+        self.loop = None
+        self.loop_thread_id = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.loop = asyncio.get_running_loop()
+            self.loop_thread_id = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            task = getattr(asyncio.tasks, "_current_tasks", {}).get(self.loop)
+            samples = self.samples.get(task)
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if samples is not None and frame is not None:
+                samples.append(";".join(f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})" for f in traceback.extract_stack(frame)))
+
+    def begin(self, task):
+        self.start()
+        self.samples[task] = []
+
+    def end(self, task) -> Counter:
+        return Counter(self.samples.pop(task, []))
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000) if PROFILE_SLOW_REQUESTS else None
+
+# -----------------------------
+# ASGI middleware
+# -----------------------------
+class MetricsMiddleware:
+    """Records latency, SQL count, DB time and slowest statement per request; adds a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        task = asyncio.current_task() if profiler else None
+        if profiler:
+            profiler.begin(task)
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                timing = f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} queries", app;dur={total_ms:.2f}'
+                message.setdefault("headers", []).append((b"server-timing", timing.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.observe(elapsed, scope["method"], route, status_code)
+            REQUEST_STATEMENTS.observe(stats.statements, route)
+            REQUEST_DB_TIME.observe(stats.db_time, route)
+            samples = profiler.end(task) if profiler else None
+            self.report(scope["method"], route, elapsed, stats, samples)
+
+    def report(self, method, route, elapsed, stats, samples):
+        repeated = stats.repeated_statements()
+        if repeated:
+            N_PLUS_ONE.inc(route)
+            for statement, count in repeated:
+                logger.warning("Possible N+1 on %s %s: statement ran %d times: %s", method, route, count, " ".join(statement.split())[:200])
+        if elapsed * 1000 >= SLOW_REQUEST_MS:
+            SLOW_REQUESTS.inc(route)
+            slowest = " ".join(stats.slowest.split())[:200] if stats.slowest else None
+            logger.warning(
+                "Slow request %s %s: %.1f ms, %d statements, %.1f ms in DB, slowest %.1f ms: %s",
+                method, route, elapsed * 1000, stats.statements, stats.db_time * 1000, stats.slowest_time * 1000, slowest,
+            )
+            if samples:
+                logger.warning("Profile for %s %s (%d samples):\n%s", method, route, sum(samples.values()),
+                               "\n".join(f"{stack} {count}" for stack, count in samples.most_common(20)))
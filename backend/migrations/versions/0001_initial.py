@@ -0,0 +1,43 @@
+"""Initial schema: users and habits
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-03-03 00:00:00
+
+Databases created before migrations existed already have these tables; run
+`alembic stamp 0001` on them instead of upgrading through this revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False, unique=True),
+        sa.Column("password", sa.String(), nullable=False),
+        sa.Column("role", sa.String(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "habits",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("completed", sa.Boolean(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+    )
+    op.create_index("ix_habits_id", "habits", ["id"])
+
+def downgrade():
+    op.drop_index("ix_habits_id", table_name="habits")
+    op.drop_table("habits")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
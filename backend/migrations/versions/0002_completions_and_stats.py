@@ -0,0 +1,62 @@
+"""Completion log, per-habit stats, frequency and updated_at columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-03-03 00:00:01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "habit_completions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_habit_completions_id", "habit_completions", ["id"])
+    op.create_index("ix_habit_completions_habit_id_day", "habit_completions", ["habit_id", "day"], unique=True)
+
+    op.create_table(
+        "habit_stats",
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("current_streak", sa.Integer(), nullable=False),
+        sa.Column("longest_streak", sa.Integer(), nullable=False),
+        sa.Column("last_completed_on", sa.Date(), nullable=True),
+        sa.Column("total_completions", sa.Integer(), nullable=False),
+    )
+
+    with op.batch_alter_table("habits") as batch:
+        batch.add_column(sa.Column("frequency", sa.String(), nullable=False, server_default="daily"))
+        batch.add_column(sa.Column("updated_at", sa.DateTime(), nullable=True))
+        batch.create_index("ix_habits_updated_at", ["updated_at"])
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("updated_at", sa.DateTime(), nullable=True))
+        batch.create_index("ix_users_updated_at", ["updated_at"])
+
+    op.execute("UPDATE habits SET updated_at = created_at")
+
+    # Existing rows have no history yet; seed empty stats so every habit has a row
+    op.execute(
+        "INSERT INTO habit_stats (habit_id, current_streak, longest_streak, total_completions) "
+        "SELECT id, 0, 0, 0 FROM habits"
+    )
+
+def downgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.drop_index("ix_users_updated_at")
+        batch.drop_column("updated_at")
+    with op.batch_alter_table("habits") as batch:
+        batch.drop_index("ix_habits_updated_at")
+        batch.drop_column("updated_at")
+        batch.drop_column("frequency")
+    op.drop_table("habit_stats")
+    op.drop_index("ix_habit_completions_habit_id_day", table_name="habit_completions")
+    op.drop_index("ix_habit_completions_id", table_name="habit_completions")
+    op.drop_table("habit_completions")
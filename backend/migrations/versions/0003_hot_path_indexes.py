@@ -0,0 +1,28 @@
+"""Indexes for per-user habit queries; rename habits.name to title
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-03-03 00:00:02
+
+`schemas.HabitCreate` has always sent `title`, so the column is renamed to match.
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table("habits") as batch:
+        batch.alter_column("name", new_column_name="title")
+    op.create_index("ix_habits_user_id_id", "habits", ["user_id", "id"])
+    op.create_index("ix_habits_user_id_created_at", "habits", ["user_id", "created_at"])
+    op.create_index("ix_users_role_id", "users", ["role", "id"])
+
+def downgrade():
+    op.drop_index("ix_users_role_id", table_name="users")
+    op.drop_index("ix_habits_user_id_created_at", table_name="habits")
+    op.drop_index("ix_habits_user_id_id", table_name="habits")
+    with op.batch_alter_table("habits") as batch:
+        batch.alter_column("title", new_column_name="name")
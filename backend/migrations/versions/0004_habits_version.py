@@ -0,0 +1,21 @@
+"""Per-user habits_version counter for ETags
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-03-03 00:00:03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("habits_version", sa.Integer(), nullable=False, server_default="0"))
+
+def downgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("habits_version")
@@ -0,0 +1,38 @@
+"""Habit reminders
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-03-03 00:00:05
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "reminders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("time_of_day", sa.Time(), nullable=False),
+        sa.Column("timezone", sa.String(), nullable=False, server_default="UTC"),
+        sa.Column("enabled", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("next_fire_at", sa.DateTime(), nullable=True),
+        sa.Column("last_fired_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_reminders_id", "reminders", ["id"])
+    op.create_index("ix_reminders_habit_id", "reminders", ["habit_id"])
+    op.create_index("ix_reminders_next_fire_at", "reminders", ["next_fire_at"])
+    op.create_index("ix_reminders_updated_at", "reminders", ["updated_at"])
+
+def downgrade():
+    op.drop_index("ix_reminders_updated_at", table_name="reminders")
+    op.drop_index("ix_reminders_next_fire_at", table_name="reminders")
+    op.drop_index("ix_reminders_habit_id", table_name="reminders")
+    op.drop_index("ix_reminders_id", table_name="reminders")
+    op.drop_table("reminders")
@@ -0,0 +1,45 @@
+"""Daily and weekly analytics rollups
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-03-03 00:00:06
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ("daily_rollups", "weekly_rollups")
+
+def upgrade():
+    for table in ROLLUP_TABLES:
+        op.create_table(
+            table,
+            sa.Column("frequency", sa.String(), primary_key=True),
+            sa.Column("period_start", sa.Date(), primary_key=True),
+            sa.Column("active_users", sa.Integer(), nullable=False),
+            sa.Column("active_habits", sa.Integer(), nullable=False),
+            sa.Column("completions", sa.Integer(), nullable=False),
+            sa.Column("habits_created", sa.Integer(), nullable=False),
+            sa.Column("total_habits", sa.Integer(), nullable=False),
+        )
+    op.create_table(
+        "rollup_state",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("high_water_mark", sa.DateTime(), nullable=False),
+    )
+    # Rollup refreshes scan completions by day and by insertion time, and habits by creation time
+    op.create_index("ix_habit_completions_day", "habit_completions", ["day"])
+    op.create_index("ix_habit_completions_created_at", "habit_completions", ["created_at"])
+    op.create_index("ix_habits_created_at", "habits", ["created_at"])
+
+def downgrade():
+    op.drop_index("ix_habits_created_at", table_name="habits")
+    op.drop_index("ix_habit_completions_created_at", table_name="habit_completions")
+    op.drop_index("ix_habit_completions_day", table_name="habit_completions")
+    op.drop_table("rollup_state")
+    for table in ROLLUP_TABLES:
+        op.drop_table(table)
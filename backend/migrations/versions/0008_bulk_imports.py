@@ -0,0 +1,75 @@
+"""Bulk import jobs, staging tables and habits.external_id
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-03-03 00:00:07
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table("habits") as batch:
+        batch.add_column(sa.Column("external_id", sa.String(), nullable=True))
+        batch.create_index("ix_habits_user_id_external_id", ["user_id", "external_id"], unique=True)
+    op.create_table(
+        "import_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("filename", sa.String(), nullable=True),
+        sa.Column("format", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("rows_read", sa.Integer(), nullable=False),
+        sa.Column("rows_failed", sa.Integer(), nullable=False),
+        sa.Column("habits_created", sa.Integer(), nullable=False),
+        sa.Column("completions_created", sa.Integer(), nullable=False),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_import_jobs_id", "import_jobs", ["id"])
+    op.create_index("ix_import_jobs_user_id", "import_jobs", ["user_id"])
+    op.create_table(
+        "import_row_errors",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("import_jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("line", sa.Integer(), nullable=False),
+        sa.Column("error", sa.String(), nullable=False),
+    )
+    op.create_index("ix_import_row_errors_job_id", "import_row_errors", ["job_id"])
+    op.create_table(
+        "import_habit_rows",
+        sa.Column("job_id", sa.Integer(), primary_key=True),
+        sa.Column("line", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("external_id", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("frequency", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "import_completion_rows",
+        sa.Column("job_id", sa.Integer(), primary_key=True),
+        sa.Column("line", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("external_id", sa.String(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("import_completion_rows")
+    op.drop_table("import_habit_rows")
+    op.drop_index("ix_import_row_errors_job_id", table_name="import_row_errors")
+    op.drop_table("import_row_errors")
+    op.drop_index("ix_import_jobs_user_id", table_name="import_jobs")
+    op.drop_index("ix_import_jobs_id", table_name="import_jobs")
+    op.drop_table("import_jobs")
+    with op.batch_alter_table("habits") as batch:
+        batch.drop_index("ix_habits_user_id_external_id")
+        batch.drop_column("external_id")
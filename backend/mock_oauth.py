@@ -0,0 +1,78 @@
+"""
+A local stand-in for the Google and GitHub OAuth endpoints, for offline development and benchmarks.
+
+    python -m mock_oauth --port 9100 --latency-ms 80
+    OAUTH_MOCK_URL=http://127.0.0.1:9100 uvicorn main:app
+
+Every authorize request is approved at once: it redirects straight back with a code.
+`login_hint` (default "mockuser") picks the identity, and its email is <login>@example.test.
+Codes and access tokens are both "mock-<login>". Each request waits `latency` seconds first,
+to stand in for the round trip to a real provider.
+"""
+import argparse
+import asyncio
+import os
+import zlib
+from typing import Optional
+from urllib.parse import urlencode
+from fastapi import FastAPI, Form, Header, HTTPException, status
+from fastapi.responses import RedirectResponse
+
+MOCK_OAUTH_LATENCY_MS = float(os.getenv("MOCK_OAUTH_LATENCY_MS", 0))
+
+def create_mock_provider(latency: float = MOCK_OAUTH_LATENCY_MS / 1000) -> FastAPI:
+    app = FastAPI(title="Mock OAuth provider", openapi_url=None)
+
+    @app.middleware("http")
+    async def provider_latency(request, call_next):
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    def login_for(authorization: Optional[str]) -> str:
+        if not authorization or not authorization.startswith("Bearer mock-"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Bad credentials")
+        return authorization[len("Bearer mock-"):]
+
+    @app.get("/{provider}/authorize")
+    async def authorize(provider: str, redirect_uri: str, state: str, login_hint: str = "mockuser"):
+        return RedirectResponse(f"{redirect_uri}?{urlencode({'code': f'mock-{login_hint}', 'state': state})}", status_code=status.HTTP_302_FOUND)
+
+    @app.post("/{provider}/token")
+    async def token(provider: str, code: str = Form(...)):
+        if not code.startswith("mock-"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bad_verification_code")
+        return {"access_token": code, "token_type": "bearer"}
+
+    @app.get("/google/v1/userinfo")
+    async def google_userinfo(authorization: Optional[str] = Header(None)):
+        login = login_for(authorization)
+        return {"sub": str(zlib.crc32(login.encode())), "email": f"{login}@example.test", "email_verified": True}
+
+    # No public email on the profile, so logins depend on the /user/emails lookup as well
+    @app.get("/github/user")
+    async def github_user(authorization: Optional[str] = Header(None)):
+        login = login_for(authorization)
+        return {"id": zlib.crc32(login.encode()), "login": login, "email": None}
+
+    @app.get("/github/user/emails")
+    async def github_emails(authorization: Optional[str] = Header(None)):
+        login = login_for(authorization)
+        return [
+            {"email": f"{login}@users.noreply.example.test", "primary": False, "verified": True},
+            {"email": f"{login}@example.test", "primary": True, "verified": True},
+        ]
+
+    return app
+
+app = create_mock_provider()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a mock Google/GitHub OAuth provider.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=MOCK_OAUTH_LATENCY_MS, help="Delay added to every provider request.")
+    args = parser.parse_args()
+    uvicorn.run(create_mock_provider(args.latency_ms / 1000), host=args.host, port=args.port, log_level="warning")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Time, ForeignKey, Index, true
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -10,17 +10,168 @@ class User(Base):
     username = Column(String, unique=True, nullable=False)
     password = Column(String, nullable=False)
     role = Column(String, default="user") 
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Bumped on every habit write; habit reads derive their ETag from it
+    habits_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_users_role_id", "role", "id"),
+    )
     
     habits = relationship("Habit", back_populates="user", cascade="all, delete-orphan")
 
 class Habit(Base):
     __tablename__ = "habits"
+    __table_args__ = (
+        Index("ix_habits_user_id_id", "user_id", "id"),
+        Index("ix_habits_user_id_created_at", "user_id", "created_at"),
+        Index("ix_habits_created_at", "created_at"),
+        # Imported habits are matched on (user_id, external_id), so re-running an import is a no-op
+        Index("ix_habits_user_id_external_id", "user_id", "external_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    title = Column(String, nullable=False)
     description = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     completed = Column(Boolean, default=False)
+    frequency = Column(String, nullable=False, default="daily", server_default="daily")
     user_id = Column(Integer, ForeignKey("users.id"))
+    external_id = Column(String, nullable=True)  # id in the tracker it was imported from
 
     user = relationship("User", back_populates="habits")
+    completions = relationship("HabitCompletion", back_populates="habit", cascade="all, delete-orphan", passive_deletes=True)
+    stats = relationship("HabitStats", back_populates="habit", uselist=False, lazy="joined", cascade="all, delete-orphan", passive_deletes=True)
+    reminders = relationship("Reminder", back_populates="habit", cascade="all, delete-orphan", passive_deletes=True)
+
+class HabitCompletion(Base):
+    __tablename__ = "habit_completions"
+    __table_args__ = (
+        Index("ix_habit_completions_habit_id_day", "habit_id", "day", unique=True),
+        Index("ix_habit_completions_day", "day"),
+        Index("ix_habit_completions_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    habit = relationship("Habit", back_populates="completions")
+
+class HabitStats(Base):
+    __tablename__ = "habit_stats"
+
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    current_streak = Column(Integer, nullable=False, default=0)
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_completed_on = Column(Date, nullable=True)
+    total_completions = Column(Integer, nullable=False, default=0)
+
+    habit = relationship("Habit", back_populates="stats")
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class Reminder(Base):
+    __tablename__ = "reminders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False, index=True)
+    time_of_day = Column(Time, nullable=False)  # local wall-clock time in `timezone`
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")
+    enabled = Column(Boolean, nullable=False, default=True, server_default=true())
+    # Next due instant (UTC). NULL while disabled, so the scheduler's range scan never sees it.
+    next_fire_at = Column(DateTime, nullable=True, index=True)
+    last_fired_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    habit = relationship("Habit", back_populates="reminders")
+
+# -----------------------------
+# Analytics rollups (maintained by rollups.py; frequency "*" is the all-habits total)
+# -----------------------------
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+
+    frequency = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    active_users = Column(Integer, nullable=False, default=0)
+    active_habits = Column(Integer, nullable=False, default=0)
+    completions = Column(Integer, nullable=False, default=0)
+    habits_created = Column(Integer, nullable=False, default=0)
+    total_habits = Column(Integer, nullable=False, default=0)
+
+class WeeklyRollup(Base):
+    __tablename__ = "weekly_rollups"
+
+    frequency = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)  # Monday of the ISO week
+    active_users = Column(Integer, nullable=False, default=0)
+    active_habits = Column(Integer, nullable=False, default=0)
+    completions = Column(Integer, nullable=False, default=0)
+    habits_created = Column(Integer, nullable=False, default=0)
+    total_habits = Column(Integer, nullable=False, default=0)
+
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+
+    name = Column(String, primary_key=True)
+    high_water_mark = Column(DateTime, nullable=False)
+
+# -----------------------------
+# Bulk imports (see imports.py)
+# -----------------------------
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String, nullable=True)
+    format = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, staging, merging, done, failed
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    habits_created = Column(Integer, nullable=False, default=0)
+    completions_created = Column(Integer, nullable=False, default=0)
+    message = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class ImportRowError(Base):
+    __tablename__ = "import_row_errors"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("import_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    line = Column(Integer, nullable=False)
+    error = Column(String, nullable=False)
+
+# Staging tables: rows are bulk-loaded here per job, merged into habits and habit_completions
+# in one transaction, then deleted. No foreign keys or secondary indexes, so loading stays cheap.
+class ImportHabitRow(Base):
+    __tablename__ = "import_habit_rows"
+
+    job_id = Column(Integer, primary_key=True)
+    line = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    external_id = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    frequency = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=True)
+
+class ImportCompletionRow(Base):
+    __tablename__ = "import_completion_rows"
+
+    job_id = Column(Integer, primary_key=True)
+    line = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    external_id = Column(String, nullable=False)
@@ -0,0 +1,126 @@
+"""
+Google and GitHub OAuth over the shared HTTP client (http_client.py).
+
+The token exchange and profile lookups reuse pooled keep-alive connections. authlib opened
+a new client, and new TLS handshakes, for each of them. GitHub's /user and /user/emails
+lookups run concurrently. A verified email is upserted into `users` with one statement.
+
+Point OAUTH_MOCK_URL at a running `python -m mock_oauth` to log in offline, without
+provider credentials.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlencode
+import httpx
+from fastapi import HTTPException, status
+from sqlalchemy.dialects import postgresql, sqlite
+import settings
+from hashing import UNUSABLE_PASSWORD
+from http_client import request
+from models import User
+
+@dataclass(frozen=True)
+class Provider:
+    name: str
+    client_id: Optional[str]
+    client_secret: Optional[str]
+    authorize_url: str
+    token_url: str
+    api_url: str
+    scope: str
+
+def build_providers(mock_url: Optional[str] = None) -> dict:
+    google = Provider(
+        "google", settings.GOOGLE_CLIENT_ID, settings.GOOGLE_CLIENT_SECRET,
+        "https://accounts.google.com/o/oauth2/auth", "https://oauth2.googleapis.com/token",
+        "https://openidconnect.googleapis.com", "openid email profile",
+    )
+    github = Provider(
+        "github", settings.GITHUB_CLIENT_ID, settings.GITHUB_CLIENT_SECRET,
+        "https://github.com/login/oauth/authorize", "https://github.com/login/oauth/access_token",
+        "https://api.github.com", "user:email",
+    )
+    providers = {"google": google, "github": github}
+    if mock_url:
+        base = mock_url.rstrip("/")
+        for name, provider in providers.items():
+            providers[name] = Provider(
+                name, provider.client_id or "mock", provider.client_secret or "mock",
+                f"{base}/{name}/authorize", f"{base}/{name}/token", f"{base}/{name}", provider.scope,
+            )
+    return providers
+
+PROVIDERS = build_providers(settings.OAUTH_MOCK_URL)
+
+# -----------------------------
+# Provider calls
+# -----------------------------
+def authorize_url(provider: Provider, redirect_uri: str, state: str) -> str:
+    params = {"client_id": provider.client_id, "redirect_uri": redirect_uri, "scope": provider.scope, "state": state, "response_type": "code"}
+    return f"{provider.authorize_url}?{urlencode(params)}"
+
+async def fetch_json(method: str, url: str, **kwargs):
+    try:
+        response = await request(method, url, **kwargs)
+    except httpx.TransportError:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="OAuth provider unavailable")
+    if response.status_code == 429 or response.status_code >= 500:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="OAuth provider unavailable")
+    if response.status_code >= 400:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OAuth authentication failed")
+    return response.json()
+
+async def exchange_code(provider: Provider, code: str, redirect_uri: str) -> str:
+    token = await fetch_json(
+        "POST", provider.token_url,
+        data={
+            "client_id": provider.client_id, "client_secret": provider.client_secret, "code": code,
+            "redirect_uri": redirect_uri, "grant_type": "authorization_code",
+        },
+        headers={"Accept": "application/json"},
+    )
+    if "access_token" not in token:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OAuth authentication failed")
+    return token["access_token"]
+
+async def google_email(provider: Provider, access_token: str) -> Optional[str]:
+    info = await fetch_json("GET", f"{provider.api_url}/v1/userinfo", headers={"Authorization": f"Bearer {access_token}"})
+    return info.get("email") if info.get("email_verified") else None
+
+async def github_email(provider: Provider, access_token: str) -> Optional[str]:
+    headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/vnd.github+json"}
+    # Both lookups at once: the public profile email wins, else the verified primary address
+    profile, emails = await asyncio.gather(
+        fetch_json("GET", f"{provider.api_url}/user", headers=headers),
+        fetch_json("GET", f"{provider.api_url}/user/emails", headers=headers),
+        return_exceptions=True,
+    )
+    if isinstance(profile, BaseException):
+        raise profile
+    if profile.get("email"):
+        return profile["email"]
+    if isinstance(emails, BaseException):
+        raise emails
+    return next((e["email"] for e in emails if e.get("primary", False) and e.get("verified", False)), None)
+
+# -----------------------------
+# Identity
+# -----------------------------
+async def upsert_oauth_user(db, email: str):
+    """
+    Insert the user for a provider-verified email, or return the existing row, in one statement.
+    Returns (id, username, role), or None if the email is the username of a password account:
+    a social login never takes over an account it did not create.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(User).values(username=email, password=UNUSABLE_PASSWORD, role="user")
+    statement = statement.on_conflict_do_update(
+        index_elements=[User.username],
+        # A no-op update, so RETURNING yields the existing row
+        set_={"username": statement.excluded.username},
+        where=User.password == UNUSABLE_PASSWORD,
+    ).returning(User.id, User.username, User.role)
+    row = (await db.execute(statement)).first()
+    await db.commit()
+    return row
@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(sort: str, row) -> str:
+    value = getattr(row, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, row.id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+        if cursor_sort != sort:
+            raise ValueError("cursor was issued for a different sort order")
+        if sort == "created_at":
+            value = datetime.fromisoformat(value)
+        return value, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def parse_fields(fields: Optional[str], allowed: set) -> Optional[list]:
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+def paginate(query, model, sort: str, cursor: Optional[str], limit: int):
+    """
+    Apply keyset pagination ordered by (sort, id). Fetches one extra row to detect the next page.
+
+    Only `id` and `created_at` are valid sort keys; both are covered by (user_id, ...) indexes.
+    """
+    if sort == "id":
+        if cursor:
+            _, last_id = decode_cursor(cursor, sort)
+            query = query.where(model.id > last_id)
+        return query.order_by(model.id).limit(limit + 1)
+
+    sort_column = getattr(model, sort)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        query = query.where(or_(sort_column > value, and_(sort_column == value, model.id > last_id)))
+    return query.order_by(sort_column, model.id).limit(limit + 1)
+
+def split_page(rows, sort: str, limit: int):
+    """Trim the lookahead row and return (rows, next_cursor)."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(sort, rows[-1])
+    return rows, None
+
+def page_response(items: list, next_cursor: Optional[str], headers: Optional[dict] = None) -> ORJSONResponse:
+    """
+    Encode a page of plain dicts straight to JSON with orjson. List endpoints build the dicts
+    from selected columns, so there is no ORM object, response_model validation or
+    jsonable_encoder pass in between.
+    """
+    headers = dict(headers or {})
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return ORJSONResponse(items, headers=headers)
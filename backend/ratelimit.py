@@ -0,0 +1,256 @@
+"""
+Token-bucket rate limiting as pure ASGI middleware.
+
+Rules are matched on (method, exact path) or (method, path prefix) and keyed by client IP,
+the `username` in a JSON body (alone or with the IP), or the bearer token's subject. A request must pass every
+matching rule. Requests no rule covers (e.g. every GET) cost one dict lookup.
+
+Each limit can be overridden with RATE_LIMIT_<RULE NAME> = "<requests>/<seconds>", e.g.
+RATE_LIMIT_LOGIN_IP=50/60.
+"""
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from metrics import CounterMetric
+from routes.auth_utils import token_subject
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Only enable behind a proxy that overwrites X-Forwarded-For, or clients can pick their own key
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+RATE_LIMIT_SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", 64))
+RATE_LIMIT_EVICT_SECONDS = float(os.getenv("RATE_LIMIT_EVICT_SECONDS", 10))
+
+MAX_KEY_BODY_BYTES = 64 * 1024
+
+RATE_LIMITED = CounterMetric("rate_limit_rejected_total", "Requests rejected with 429.", ("rule",))
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    methods: tuple
+    key: str  # "ip", "username", "username_ip" or "user"
+    limit: int  # bucket size (burst)
+    period: float  # seconds to refill a full bucket
+    paths: tuple = ()
+    prefixes: tuple = ()
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+def configured(rule: Rule) -> Rule:
+    override = os.getenv(f"RATE_LIMIT_{rule.name.upper()}")
+    if not override:
+        return rule
+    limit, period = override.split("/")
+    return Rule(rule.name, rule.methods, rule.key, int(limit), float(period), rule.paths, rule.prefixes)
+
+LOGIN_PATHS = ("/auth/login", "/users/login")
+REGISTER_PATHS = ("/auth/register", "/users/register")
+
+DEFAULT_RULES = [
+    Rule("login_ip", ("POST",), "ip", 20, 60, paths=LOGIN_PATHS),
+    # Per username and IP, so bad passwords sprayed from elsewhere cannot lock the owner out
+    Rule("login_username", ("POST",), "username_ip", 10, 300, paths=LOGIN_PATHS),
+    Rule("register_ip", ("POST",), "ip", 10, 3600, paths=REGISTER_PATHS),
+    Rule("refresh_ip", ("POST",), "ip", 30, 60, paths=("/auth/refresh",)),
+    Rule("writes_user", ("POST", "PUT", "DELETE"), "user", 300, 60, prefixes=("/habits", "/reminders")),
+    Rule("imports_user", ("POST",), "user", 10, 3600, prefixes=("/imports",)),
+]
+
+# -----------------------------
+# Backends
+# -----------------------------
+class RateLimitBackend:
+    """Interface for bucket storage. Subclass this to share buckets between processes (e.g. Redis)."""
+
+    async def hit(self, key: str, rule: Rule, now: float):
+        """Take one token. Returns (allowed, tokens left, seconds until full, seconds until the next token)."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets live in `shards` dicts, each with its own lock, so concurrent threads rarely contend.
+    A bucket is (tokens, last refill time, period). A bucket idle for its rule's period has
+    refilled completely and holds no information, so one shard is swept for those every
+    `evict_seconds`.
+    """
+
+    def __init__(self, shards: int = 64, evict_seconds: float = 10):
+        self.shards = [({}, threading.Lock()) for _ in range(shards)]
+        self.evict_seconds = evict_seconds
+        self.next_evict = time.monotonic() + evict_seconds
+        self.evict_shard = 0
+        self.evicted = 0
+
+    async def hit(self, key, rule, now):
+        buckets, lock = self.shards[hash(key) % len(self.shards)]
+        with lock:
+            tokens, last, _ = buckets.get(key, (rule.limit, now, rule.period))
+            tokens = min(rule.limit, tokens + (now - last) * rule.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            buckets[key] = (tokens, now, rule.period)
+        if now >= self.next_evict:
+            self.evict(now)
+        return allowed, tokens, (rule.limit - tokens) / rule.rate, max(0.0, 1 - tokens) / rule.rate
+
+    def evict(self, now: float):
+        self.next_evict = now + self.evict_seconds
+        self.evict_shard = (self.evict_shard + 1) % len(self.shards)
+        buckets, lock = self.shards[self.evict_shard]
+        with lock:
+            idle = [key for key, (_, last, period) in buckets.items() if now - last >= period]
+            for key in idle:
+                del buckets[key]
+        self.evicted += len(idle)
+
+    def stats(self):
+        return {"buckets": sum(len(buckets) for buckets, _ in self.shards), "evicted": self.evicted}
+
+rate_limit_backend: RateLimitBackend = InMemoryRateLimitBackend(RATE_LIMIT_SHARDS, RATE_LIMIT_EVICT_SECONDS)
+
+def set_rate_limit_backend(backend: RateLimitBackend):
+    global rate_limit_backend
+    rate_limit_backend = backend
+
+# -----------------------------
+# Key extraction
+# -----------------------------
+def client_ip(scope) -> Optional[str]:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else None
+
+def body_username(body: bytes) -> Optional[str]:
+    try:
+        username = json.loads(body).get("username")
+    except (ValueError, AttributeError):
+        return None
+    return username.lower() if isinstance(username, str) else None
+
+async def read_body(receive, limit: int):
+    """
+    Read the request body, stopping once more than `limit` bytes have arrived. Returns the
+    body (None if it was larger or incomplete) and a `receive` that replays every message read.
+    """
+    messages, size, complete = [], 0, False
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        size += len(message.get("body", b""))
+        if size > limit:
+            break
+        if not message.get("more_body", False):
+            complete = True
+            break
+    body = b"".join(message.get("body", b"") for message in messages) if complete else None
+
+    async def replay():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    return body, replay
+
+# -----------------------------
+# Middleware
+# -----------------------------
+class RateLimitMiddleware:
+    """Applies the matching rules and adds RateLimit-Limit/-Remaining/-Reset and RateLimit-Policy headers."""
+
+    def __init__(self, app, rules=None):
+        self.app = app
+        self.exact = {}
+        self.prefixes = {}
+        for rule in map(configured, rules if rules is not None else DEFAULT_RULES):
+            for method in rule.methods:
+                for path in rule.paths:
+                    self.exact.setdefault((method, path), []).append(rule)
+                for prefix in rule.prefixes:
+                    self.prefixes.setdefault(method, []).append((prefix, rule))
+
+    def match(self, method: str, path: str) -> list:
+        rules = self.exact.get((method, path), [])
+        prefixes = self.prefixes.get(method)
+        if prefixes:
+            rules = rules + [rule for prefix, rule in prefixes if path.startswith(prefix)]
+        return rules
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        rules = self.match(scope["method"], scope["path"])
+        if not rules:
+            return await self.app(scope, receive, send)
+
+        username = None
+        if any(rule.key in ("username", "username_ip") for rule in rules):
+            # A larger body is passed through unparsed and only the IP rules apply
+            body, receive = await read_body(receive, MAX_KEY_BODY_BYTES)
+            if body is not None:
+                username = body_username(body)
+
+        now = time.monotonic()
+        tightest = None
+        for rule in rules:
+            if rule.key == "ip":
+                subject = client_ip(scope)
+            elif rule.key == "username":
+                subject = username
+            elif rule.key == "username_ip":
+                subject = None if username is None else f"{username}\x00{client_ip(scope)}"
+            else:
+                subject = token_subject(scope)
+            if subject is None:
+                continue
+            allowed, tokens, reset, retry_after = await rate_limit_backend.hit(f"{subject}\x00{rule.name}", rule, now)
+            # Report the rule that rejected the request, otherwise the one closest to running out
+            if tightest is None or not allowed or tokens < tightest[1]:
+                tightest = (allowed, tokens, reset, retry_after, rule)
+            if not allowed:
+                break
+
+        if tightest is None:
+            return await self.app(scope, receive, send)
+        allowed, tokens, reset, retry_after, rule = tightest
+        headers = [
+            (b"ratelimit-limit", str(rule.limit).encode()),
+            (b"ratelimit-remaining", str(int(tokens)).encode()),
+            (b"ratelimit-reset", str(math.ceil(reset)).encode()),
+            (b"ratelimit-policy", f"{rule.limit};w={int(rule.period)}".encode()),
+        ]
+
+        if not allowed:
+            RATE_LIMITED.inc(rule.name)
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [(b"retry-after", str(math.ceil(retry_after)).encode()), (b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).extend(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+def rate_limit_samples() -> list:
+    stats = rate_limit_backend.stats()
+    return [("rate_limit_buckets", "gauge", "Rate limit buckets held in memory.", stats["buckets"])]
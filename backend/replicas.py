@@ -0,0 +1,144 @@
+"""
+Routing for read-only routes across the read replicas in DATABASE_REPLICA_URLS.
+
+Read-only handlers take their session from `get_read_db` instead of `get_async_db`:
+
+- Replicas are tried in round-robin or least-connections order (DB_REPLICA_STRATEGY). The
+  connection is checked out before the handler runs. A replica that cannot be reached is
+  skipped for DB_REPLICA_RETRY_SECONDS and the next one is tried. With every replica down,
+  reads go to the primary.
+- When a user commits a write, their reads stay on the primary for DB_STICKY_SECONDS, so
+  they never read back older data than they wrote. The window is kept per process. Set it
+  above your replication lag.
+- Without replicas, `get_read_db` is the primary session and nothing else changes.
+"""
+import logging
+import os
+import time
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from cache import InMemoryCache
+from database import AsyncSessionLocal, DATABASE_REPLICA_URLS, replica_engines
+from routes.auth_utils import token_subject
+
+logger = logging.getLogger(__name__)
+
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")  # or "least_connections"
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))
+DB_STICKY_SECONDS = float(os.getenv("DB_STICKY_SECONDS", 5))
+DB_STICKY_MAX_USERS = int(os.getenv("DB_STICKY_MAX_USERS", 100000))
+
+class Replica:
+    def __init__(self, name: str, async_engine):
+        self.name = name
+        self.engine = async_engine
+        self.sessionmaker = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        self.in_flight = 0
+        self.down_until = 0.0
+        self.served = 0
+
+class ReplicaRouter:
+    def __init__(self, replicas: list, strategy: str = "round_robin", retry_seconds: float = 30):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.replicas = replicas
+        self.strategy = strategy
+        self.retry_seconds = retry_seconds
+        self.next_index = 0
+        self.failovers = 0
+        self.primary_reads = 0
+
+    def candidates(self, now: float) -> list:
+        """Replicas to try, in order. One marked down is tried again once its retry time passes."""
+        count = len(self.replicas)
+        start, self.next_index = self.next_index, (self.next_index + 1) % count
+        rotated = [self.replicas[(start + offset) % count] for offset in range(count)]
+        if self.strategy == "least_connections":
+            # sorted() is stable, so ties keep the round-robin order
+            rotated.sort(key=lambda replica: replica.in_flight)
+        return [replica for replica in rotated if replica.down_until <= now]
+
+    def mark_down(self, replica: Replica, error: Exception):
+        replica.down_until = time.monotonic() + self.retry_seconds
+        self.failovers += 1
+        logger.warning("Replica %s unavailable, retrying in %.0fs: %s", replica.name, self.retry_seconds, error)
+
+    def samples(self):
+        now = time.monotonic()
+        return [
+            ("db_replicas_up", "gauge", "Read replicas currently accepting reads.", sum(replica.down_until <= now for replica in self.replicas)),
+            ("db_replica_in_flight", "gauge", "Read sessions currently open on replicas.", sum(replica.in_flight for replica in self.replicas)),
+            ("db_replica_reads_total", "counter", "Read sessions served by a replica.", sum(replica.served for replica in self.replicas)),
+            ("db_replica_primary_reads_total", "counter", "Read sessions sent to the primary (recent write or no replica up).", self.primary_reads),
+            ("db_replica_failovers_total", "counter", "Times a replica was skipped because it could not be reached.", self.failovers),
+        ]
+
+def replica_name(url: str) -> str:
+    # Host and database only, never credentials
+    return url.rsplit("@", 1)[-1]
+
+replica_router = ReplicaRouter(
+    [Replica(replica_name(url), replica_engine) for url, replica_engine in zip(DATABASE_REPLICA_URLS, replica_engines)],
+    DB_REPLICA_STRATEGY,
+    DB_REPLICA_RETRY_SECONDS,
+)
+
+# -----------------------------
+# Read-your-writes
+# -----------------------------
+# Users who committed a write in the last DB_STICKY_SECONDS
+recent_writers = InMemoryCache(max_size=DB_STICKY_MAX_USERS, ttl=DB_STICKY_SECONDS)
+
+def mark_written(session: Session):
+    session.info["wrote"] = True
+
+def mark_statement(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+def remember_writer(session: Session):
+    # `subject` is set by get_current_user on the request's primary session
+    if session.info.pop("wrote", False) and "subject" in session.info:
+        recent_writers.set(session.info["subject"], True)
+
+def wrote_recently(subject: Optional[str]) -> bool:
+    return subject is not None and recent_writers.get(subject) is not None
+
+if replica_router.replicas:
+    event.listen(Session, "after_flush", lambda session, flush_context: mark_written(session))
+    event.listen(Session, "do_orm_execute", mark_statement)
+    event.listen(Session, "after_commit", remember_writer)
+
+# -----------------------------
+# Dependency
+# -----------------------------
+async def get_read_db(request: Request):
+    if replica_router.replicas and not wrote_recently(token_subject(request.scope)):
+        for replica in replica_router.candidates(time.monotonic()):
+            db = replica.sessionmaker()
+            try:
+                await db.connection()
+            except (DBAPIError, OSError) as exc:
+                await db.close()
+                replica_router.mark_down(replica, exc)
+                continue
+            replica.in_flight += 1
+            replica.served += 1
+            try:
+                yield db
+            except DBAPIError as exc:
+                if exc.connection_invalidated:
+                    replica_router.mark_down(replica, exc)
+                raise
+            finally:
+                replica.in_flight -= 1
+                await db.close()
+            return
+
+    replica_router.primary_reads += bool(replica_router.replicas)
+    async with AsyncSessionLocal() as db:
+        yield db
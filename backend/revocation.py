@@ -0,0 +1,131 @@
+import hashlib
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from database import AsyncSessionLocal
+from models import RevokedToken
+
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", 100000))
+REVOCATION_ERROR_RATE = float(os.getenv("REVOCATION_ERROR_RATE", 0.01))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", 30))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", 3600))
+
+class BloomFilter:
+    """Fixed-size Bloom filter: no false negatives, about `error_rate` false positives at `capacity` items."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: two 64-bit halves of one digest give all k positions
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class RevocationStore:
+    """
+    Denylist of revoked token ids (`jti`). The `revoked_tokens` table is the source of truth.
+    An in-process Bloom filter sits in front of it, so a token that was never revoked is
+    cleared in constant time and memory without touching the database. A filter hit is
+    confirmed with a primary-key lookup.
+
+    Revocations made by other workers reach this worker's filter on the next sync, at most
+    REVOCATION_SYNC_SECONDS later. The filter is rebuilt periodically to drop expired entries.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, sync_seconds: float, rebuild_seconds: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.synced_until = None
+        # Ids revoked in this process while a rebuild is loading, added to the new filter too
+        self.revoked_during_rebuild = None
+        self.next_sync = 0.0
+        self.next_rebuild = 0.0
+        self.filter_hits = 0
+        self.false_positives = 0
+
+    async def sync(self, db):
+        now = time.monotonic()
+        self.next_sync = now + self.sync_seconds
+        if now >= self.next_rebuild:
+            self.next_rebuild = now + self.rebuild_seconds
+            await self.rebuild(db)
+            return
+
+        query = select(RevokedToken.jti, RevokedToken.revoked_at)
+        if self.synced_until is not None:
+            # Overlap the previous window so rows committed late by other workers are not missed
+            query = query.where(RevokedToken.revoked_at >= self.synced_until - timedelta(seconds=self.sync_seconds))
+        for jti, revoked_at in await db.execute(query):
+            self.bloom.add(jti)
+            self.synced_until = max(self.synced_until or revoked_at, revoked_at)
+
+    async def rebuild(self, db):
+        # The purge commits, so it gets its own session rather than the caller's
+        async with AsyncSessionLocal() as purge_db:
+            await purge_db.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow()))
+            await purge_db.commit()
+
+        # Load a fresh filter on the side; the live one keeps answering until the swap
+        bloom, synced_until = BloomFilter(self.capacity, self.error_rate), None
+        self.revoked_during_rebuild = set()
+        try:
+            for jti, revoked_at in await db.execute(select(RevokedToken.jti, RevokedToken.revoked_at)):
+                bloom.add(jti)
+                synced_until = max(synced_until or revoked_at, revoked_at)
+            for jti in self.revoked_during_rebuild:
+                bloom.add(jti)
+            self.bloom, self.synced_until = bloom, synced_until
+        finally:
+            self.revoked_during_rebuild = None
+
+    async def is_revoked(self, jti, db) -> bool:
+        if jti is None:
+            return False
+        if time.monotonic() >= self.next_sync:
+            await self.sync(db)
+        if jti not in self.bloom:
+            return False
+        self.filter_hits += 1
+        revoked = await db.get(RevokedToken, jti) is not None
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    async def revoke(self, jti, expires_at: datetime, db):
+        """Add `jti` to the denylist. Returns False if it was already revoked."""
+        if jti is None:
+            return False
+        self.bloom.add(jti)
+        if self.revoked_during_rebuild is not None:
+            self.revoked_during_rebuild.add(jti)
+        db.add(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=datetime.utcnow()))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return False
+        return True
+
+    def samples(self):
+        return [
+            ("token_revocation_filter_hits_total", "counter", "Revocation checks that hit the Bloom filter.", self.filter_hits),
+            ("token_revocation_false_positives_total", "counter", "Bloom filter hits that were not revoked.", self.false_positives),
+        ]
+
+revocation_store = RevocationStore(REVOCATION_CAPACITY, REVOCATION_ERROR_RATE, REVOCATION_SYNC_SECONDS, REVOCATION_REBUILD_SECONDS)
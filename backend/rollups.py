@@ -0,0 +1,281 @@
+"""
+Daily and weekly analytics rollups.
+
+Each rollup row aggregates one period (a day, or an ISO week starting Monday) for one habit
+frequency, plus a "*" row for all habits. Periods are always recomputed whole from the raw
+tables and replaced, so recomputing a period twice is harmless.
+
+The background job recomputes the last ROLLUP_REFRESH_DAYS days, plus every day that received
+check-ins or new habits since the stored high-water mark. History, and undos or deletions
+older than the refresh window, are rebuilt with the backfill command:
+
+    python -m rollups backfill [--start 2024-01-01] [--end 2025-01-01] [--chunk-days 28]
+    python -m rollups refresh
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import Date, delete, distinct, func, insert, select
+from database import AsyncSessionLocal
+from models import DailyRollup, Habit, HabitCompletion, RollupState, WeeklyRollup
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_JOB_ENABLED = os.getenv("ROLLUP_JOB_ENABLED", "true").lower() in ("1", "true", "yes")
+ROLLUP_INTERVAL_SECONDS = float(os.getenv("ROLLUP_INTERVAL_SECONDS", 300))
+ROLLUP_REFRESH_DAYS = int(os.getenv("ROLLUP_REFRESH_DAYS", 2))
+# Rows committed late by slow transactions can carry a created_at slightly before the mark
+ROLLUP_OVERLAP_SECONDS = float(os.getenv("ROLLUP_OVERLAP_SECONDS", 300))
+ROLLUP_CHUNK_DAYS = 28
+
+ALL = "*"
+STATE_NAME = "habit_rollups"
+# Postgres advisory lock held by the transaction that rewrites rollup rows ("roll")
+ROLLUP_LOCK_KEY = 0x726F6C6C
+ACTIVITY_COLUMNS = ("completions", "active_habits", "active_users")
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+def day_range(start: date, end: date):
+    day = start
+    while day < end:
+        yield day
+        day += timedelta(days=1)
+
+def contiguous_ranges(days) -> list:
+    """Collapse a set of days into [start, end) ranges."""
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [tuple(r) for r in ranges]
+
+def created_day():
+    return func.date(Habit.created_at, type_=Date)
+
+# -----------------------------
+# Aggregation (sync Session; the async job runs it through AsyncSession.run_sync)
+# -----------------------------
+def aggregate(db, start: date, end: date, by_day: bool) -> list:
+    """Rollup rows for [start, end): one period per day if `by_day`, otherwise one period starting at `start`."""
+    start_at, end_at = datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+
+    def period(row):
+        return row.period if by_day else start
+
+    # Habits that existed before the range, then the ones created in each period
+    totals = Counter(dict(db.execute(
+        select(Habit.frequency, func.count()).where(Habit.created_at < start_at).group_by(Habit.frequency)
+    ).all()))
+    created = defaultdict(Counter)
+    created_period = [created_day().label("period")] if by_day else []
+    for row in db.execute(
+        select(*created_period, Habit.frequency, func.count().label("n"))
+        .where(Habit.created_at >= start_at, Habit.created_at < end_at)
+        .group_by(*created_period, Habit.frequency)
+    ):
+        created[period(row)][row.frequency] += row.n
+
+    # Check-in activity per frequency, and overall (distinct users do not add up across frequencies)
+    activity_period = [HabitCompletion.day.label("period")] if by_day else []
+    activity = {}
+    for frequency in (Habit.frequency, None):
+        group = activity_period + ([frequency] if frequency is not None else [])
+        query = (
+            select(
+                *group,
+                func.count().label("completions"),
+                func.count(distinct(HabitCompletion.habit_id)).label("active_habits"),
+                func.count(distinct(Habit.user_id)).label("active_users"),
+            )
+            .join(Habit, Habit.id == HabitCompletion.habit_id)
+            .where(HabitCompletion.day >= start, HabitCompletion.day < end)
+        )
+        for row in db.execute(query.group_by(*group) if group else query):
+            key = (period(row), row.frequency if frequency is not None else ALL)
+            activity[key] = {name: getattr(row, name) for name in ACTIVITY_COLUMNS}
+
+    rows = []
+    for period_start in (day_range(start, end) if by_day else [start]):
+        totals.update(created[period_start])
+        frequencies = {name for name, count in totals.items() if count} | {f for p, f in activity if p == period_start and f != ALL}
+        for frequency in sorted(frequencies) + [ALL]:
+            rows.append({
+                "frequency": frequency,
+                "period_start": period_start,
+                "habits_created": sum(created[period_start].values()) if frequency == ALL else created[period_start][frequency],
+                "total_habits": sum(totals.values()) if frequency == ALL else totals[frequency],
+                **activity.get((period_start, frequency), dict.fromkeys(ACTIVITY_COLUMNS, 0)),
+            })
+    return rows
+
+def replace_rows(db, model, start: date, end: date, rows):
+    db.execute(delete(model).where(model.period_start >= start, model.period_start < end))
+    if rows:
+        db.execute(insert(model), rows)
+
+def rebuild_days(db, start: date, end: date):
+    replace_rows(db, DailyRollup, start, end, aggregate(db, start, end, by_day=True))
+
+def rebuild_week(db, monday: date):
+    end = monday + timedelta(days=7)
+    replace_rows(db, WeeklyRollup, monday, end, aggregate(db, monday, end, by_day=False))
+
+def lock_rollups(db, wait: bool) -> bool:
+    """
+    Take the rollup lock for the current transaction, so only one process rewrites rollup
+    rows at a time. Without `wait`, returns False if another transaction holds it. SQLite
+    allows a single writer, so there is nothing to take.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    if wait:
+        db.execute(select(func.pg_advisory_xact_lock(ROLLUP_LOCK_KEY)))
+        return True
+    return bool(db.execute(select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_KEY))).scalar())
+
+def set_high_water_mark(db, mark: datetime):
+    state = db.get(RollupState, STATE_NAME)
+    if state is None:
+        db.add(RollupState(name=STATE_NAME, high_water_mark=mark))
+    else:
+        state.high_water_mark = max(state.high_water_mark, mark)
+
+def refresh_rollups(db, refresh_days: int = ROLLUP_REFRESH_DAYS, wait: bool = True):
+    """
+    Recompute the periods touched since the high-water mark. Returns the number of days
+    rebuilt, or None without `wait` when another process is refreshing right now.
+    """
+    if not lock_rollups(db, wait):
+        db.rollback()
+        return None
+    started = datetime.utcnow()
+    days = {started.date() - timedelta(days=offset) for offset in range(refresh_days)}
+
+    state = db.get(RollupState, STATE_NAME)
+    if state is not None:
+        since = state.high_water_mark - timedelta(seconds=ROLLUP_OVERLAP_SECONDS)
+        days.update(db.execute(select(HabitCompletion.day).where(HabitCompletion.created_at >= since).distinct()).scalars())
+        days.update(db.execute(select(created_day()).where(Habit.created_at >= since).distinct()).scalars())
+
+    for start, end in contiguous_ranges(days):
+        rebuild_days(db, start, end)
+    for monday in sorted({week_start(day) for day in days}):
+        rebuild_week(db, monday)
+    set_high_water_mark(db, started)
+    db.commit()
+    return len(days)
+
+def backfill(db, start=None, end=None, chunk_days: int = ROLLUP_CHUNK_DAYS, progress=print) -> int:
+    """Rebuild [start, end) in chunks of whole weeks, committing once per chunk."""
+    started = datetime.utcnow()
+    if start is None:
+        first_completion = db.execute(select(func.min(HabitCompletion.day))).scalar()
+        first_habit = db.execute(select(func.min(Habit.created_at))).scalar()
+        candidates = [first_completion, first_habit.date() if first_habit else None]
+        start = min((day for day in candidates if day is not None), default=started.date())
+    end = end or started.date() + timedelta(days=1)
+    chunk = timedelta(days=max(7, chunk_days // 7 * 7))
+
+    cursor, chunks = week_start(start), 0
+    while cursor < end:
+        # Chunks hold whole weeks; daily rows stop at `end`
+        chunk_end = min(cursor + chunk, week_start(end - timedelta(days=1)) + timedelta(days=7))
+        lock_rollups(db, wait=True)
+        rebuild_days(db, cursor, min(chunk_end, end))
+        for monday in day_range(cursor, chunk_end):
+            if monday.weekday() == 0:
+                rebuild_week(db, monday)
+        db.commit()
+        chunks += 1
+        progress(f"Rebuilt rollups for {cursor} .. {chunk_end - timedelta(days=1)}")
+        cursor = chunk_end
+
+    lock_rollups(db, wait=True)
+    set_high_water_mark(db, started)
+    db.commit()
+    return chunks
+
+# -----------------------------
+# Background job
+# -----------------------------
+class RollupJob:
+    """
+    Runs refresh_rollups every `interval` seconds on the app's event loop. Every worker runs
+    the job; on PostgreSQL a run that finds another worker's refresh in progress is skipped.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.task = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.last_days = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="rollup-job")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    days = await db.run_sync(refresh_rollups, wait=False)
+                if days is None:
+                    self.skipped += 1
+                else:
+                    self.last_days = days
+                    self.runs += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logger.exception("Rollup refresh failed")
+            self.last_duration = time.perf_counter() - started
+            await asyncio.sleep(self.interval)
+
+    def samples(self):
+        return [
+            ("rollup_refresh_runs_total", "counter", "Completed rollup refreshes.", self.runs),
+            ("rollup_refresh_failures_total", "counter", "Failed rollup refreshes.", self.failures),
+            ("rollup_refresh_skipped_total", "counter", "Refreshes skipped because another worker held the rollup lock.", self.skipped),
+            ("rollup_refresh_last_seconds", "gauge", "Duration of the last rollup refresh.", self.last_duration),
+            ("rollup_refresh_last_days", "gauge", "Days recomputed by the last rollup refresh.", self.last_days),
+        ]
+
+rollup_job = RollupJob(ROLLUP_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the daily and weekly analytics rollups.")
+    parser.add_argument("command", choices=["refresh", "backfill"])
+    parser.add_argument("--start", type=date.fromisoformat, help="First day to rebuild (default: earliest data).")
+    parser.add_argument("--end", type=date.fromisoformat, help="Day after the last one to rebuild (default: tomorrow).")
+    parser.add_argument("--chunk-days", type=int, default=ROLLUP_CHUNK_DAYS)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "refresh":
+            print(f"Refreshed rollups for {refresh_rollups(db)} day(s)")
+        else:
+            print(f"Backfilled {backfill(db, args.start, args.end, args.chunk_days)} chunk(s)")
@@ -0,0 +1,60 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import DailyRollup, RollupState, User, WeeklyRollup
+from schemas import RollupResponse, RollupStatusResponse
+from replicas import get_read_db
+from routes.users import require_admin
+from rollups import ALL, STATE_NAME, week_start
+
+router = APIRouter()
+
+MAX_RANGE_DAYS = 3660
+DEFAULT_RANGE_DAYS = 30
+
+def resolve_range(start: Optional[date], end: Optional[date]):
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if start > end or (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"start must be on or before end, at most {MAX_RANGE_DAYS} days apart")
+    return start, end
+
+async def read_rollups(db: AsyncSession, model, frequency: str, start: date, end: date):
+    result = await db.execute(
+        select(model)
+        .where(model.frequency == frequency, model.period_start >= start, model.period_start <= end)
+        .order_by(model.period_start)
+    )
+    return result.scalars().all()
+
+# ✅ Daily active users, new habits, check-ins and completion rate per day
+@router.get("/daily", response_model=list[RollupResponse], summary="Daily rollups (admin only)")
+async def get_daily_rollups(
+    start: Optional[date] = Query(None, description="First day (default: 30 days before end)."),
+    end: Optional[date] = Query(None, description="Last day, inclusive (default: today, UTC)."),
+    frequency: str = Query(ALL, description="Habit frequency, or '*' for all habits."),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(require_admin),
+):
+    start, end = resolve_range(start, end)
+    return await read_rollups(db, DailyRollup, frequency, start, end)
+
+# ✅ The same metrics per ISO week (weeks start on Monday)
+@router.get("/weekly", response_model=list[RollupResponse], summary="Weekly rollups (admin only)")
+async def get_weekly_rollups(
+    start: Optional[date] = Query(None, description="Any day in the first week."),
+    end: Optional[date] = Query(None, description="Any day in the last week."),
+    frequency: str = Query(ALL, description="Habit frequency, or '*' for all habits."),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(require_admin),
+):
+    start, end = resolve_range(start, end)
+    return await read_rollups(db, WeeklyRollup, frequency, week_start(start), end)
+
+# ✅ How fresh the rollups are
+@router.get("/status", response_model=RollupStatusResponse, summary="Rollup high-water mark (admin only)")
+async def get_rollup_status(db: AsyncSession = Depends(get_read_db), current_user: User = Depends(require_admin)):
+    state = await db.get(RollupState, STATE_NAME)
+    return {"high_water_mark": state.high_water_mark if state else None}
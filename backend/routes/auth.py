@@ -1,166 +1,169 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from jose import JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import RedirectResponse
 from models import User
 from schemas import UserCreate, UserLogin, UserResponse, TokenResponse
-from database import get_db
-from passlib.context import CryptContext
+from database import get_async_db
+from hashing import hash_password, verify_password, needs_rehash, rehash_password, hashing_pool
+from revocation import revocation_store
+from oauth import PROVIDERS, authorize_url, exchange_code, github_email, google_email, upsert_oauth_user
 from .auth_utils import (
     create_access_token, 
     create_refresh_token, 
-    verify_password, 
+    decode_token,
     get_current_user, 
-    verify_refresh_token, 
-    get_password_hash as hash_password
+    optional_oauth2_scheme,
+    token_expires_at,
+    verify_refresh_token,
 )
-from authlib.integrations.starlette_client import OAuth
-from dotenv import load_dotenv
 from datetime import timedelta
 import os
-
-load_dotenv()
+import settings
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-STATE_SECRET = os.getenv("STATE_SECRET")
 
 # -----------------------------
 # Admin Authorization Dependency
 # -----------------------------
-def require_admin(current_user: User = Depends(get_current_user)):
+async def require_admin(current_user: User = Depends(get_current_user)):
     if not hasattr(current_user, "role") or current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     return current_user
 
 # -----------------------------
-# OAuth Setup and Endpoints
+# OAuth Endpoints (provider calls and the user upsert live in oauth.py)
 # -----------------------------
-oauth = OAuth()
-oauth.register(
-    name="google",
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    authorize_url="https://accounts.google.com/o/oauth2/auth",
-    authorize_params={"scope": "openid email profile"},
-    access_token_url="https://oauth2.googleapis.com/token",
-    client_kwargs={"scope": "openid email profile"},
-)
-oauth.register(
-    name="github",
-    client_id=os.getenv("GITHUB_CLIENT_ID"),
-    client_secret=os.getenv("GITHUB_CLIENT_SECRET"),
-    authorize_url="https://github.com/login/oauth/authorize",
-    access_token_url="https://github.com/login/oauth/access_token",
-    client_kwargs={"scope": "user:email"},
-)
-
-# ----- Google OAuth Endpoints -----
-@router.get("/google/login", operation_id="google_login", summary="Google OAuth login")
-async def google_login(request: Request):
-    redirect_uri = f"{os.getenv('BASE_URL')}/auth/google/callback"
+def oauth_login_redirect(provider_name: str) -> RedirectResponse:
+    redirect_uri = f"{settings.BASE_URL}/auth/{provider_name}/callback"
     state = os.urandom(16).hex()  # Generate a unique state
-    response = await oauth.google.authorize_redirect(request, redirect_uri, state=state)
+    response = RedirectResponse(url=authorize_url(PROVIDERS[provider_name], redirect_uri, state), status_code=status.HTTP_302_FOUND)
     # Store the state in a secure, HTTP-only cookie
     response.set_cookie(key="oauth_state", value=state, httponly=True, secure=True, samesite="Lax")
     return response
 
-@router.get("/google/callback", operation_id="google_callback", summary="Google OAuth callback")
-async def google_callback(request: Request):
+def oauth_callback_code(request: Request) -> str:
     # Retrieve the state from the cookie
     stored_state = request.cookies.get("oauth_state")
     received_state = request.query_params.get("state")
     if not stored_state or stored_state != received_state:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="State mismatch! Possible CSRF attack.")
-    
-    token = await oauth.google.authorize_access_token(request)
-    user_info = token.get("userinfo")
-    if not user_info or "email" not in user_info:
+    code = request.query_params.get("code")
+    if not code:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing authorization code")
+    return code
+
+async def oauth_success(db: AsyncSession, email: str) -> RedirectResponse:
+    user = await upsert_oauth_user(db, email)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This email belongs to an account that signs in with a password")
+    access_token = create_access_token(data={"sub": user.username, "role": user.role}, expires_delta=timedelta(minutes=60))
+    refresh_token = create_refresh_token(data={"sub": user.username})
+    return RedirectResponse(url=f"{settings.FRONTEND_URL}/oauth-success?token={access_token}&refresh={refresh_token}")
+
+# ----- Google OAuth Endpoints -----
+@router.get("/google/login", operation_id="google_login", summary="Google OAuth login")
+async def google_login():
+    return oauth_login_redirect("google")
+
+@router.get("/google/callback", operation_id="google_callback", summary="Google OAuth callback")
+async def google_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
+    code = oauth_callback_code(request)
+    google = PROVIDERS["google"]
+    access_token = await exchange_code(google, code, f"{settings.BASE_URL}/auth/google/callback")
+    email = await google_email(google, access_token)
+    if not email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Google authentication failed")
-    
-    access_token = create_access_token(data={"sub": user_info["email"]}, expires_delta=timedelta(minutes=60))
-    refresh_token = create_refresh_token(data={"sub": user_info["email"]})
-    return RedirectResponse(url=f"{os.getenv('FRONTEND_URL')}/oauth-success?token={access_token}&refresh={refresh_token}")
+    return await oauth_success(db, email)
 
 # ----- GitHub OAuth Endpoints -----
 @router.get("/github/login", operation_id="github_login", summary="GitHub OAuth login")
-async def github_login(request: Request):
-    redirect_uri = f"{os.getenv('BASE_URL')}/auth/github/callback"
-    state = os.urandom(16).hex()
-    response = await oauth.github.authorize_redirect(request, redirect_uri, state=state)
-    # Store the state in a secure, HTTP-only cookie
-    response.set_cookie(key="oauth_state", value=state, httponly=True, secure=True, samesite="Lax")
-    return response
+async def github_login():
+    return oauth_login_redirect("github")
 
 @router.get("/github/callback", operation_id="github_callback", summary="GitHub OAuth callback")
-async def github_callback(request: Request):
-    # Retrieve the state from the cookie
-    stored_state = request.cookies.get("oauth_state")
-    received_state = request.query_params.get("state")
-    if not stored_state or stored_state != received_state:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="State mismatch! Possible CSRF attack.")
-    
-    token = await oauth.github.authorize_access_token(request)
-    user_info = await oauth.github.get("https://api.github.com/user", token=token)
-    user_info_json = user_info.json()
-    email = user_info_json.get("email")
-    if not email:
-        emails_response = await oauth.github.get("https://api.github.com/user/emails", token=token)
-        emails = emails_response.json()
-        email = next((e["email"] for e in emails if e.get("primary", False) and e.get("verified", False)), None)
+async def github_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
+    code = oauth_callback_code(request)
+    github = PROVIDERS["github"]
+    access_token = await exchange_code(github, code, f"{settings.BASE_URL}/auth/github/callback")
+    email = await github_email(github, access_token)
     if not email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="GitHub email not found")
-    
-    access_token = create_access_token(data={"sub": email}, expires_delta=timedelta(minutes=60))
-    refresh_token = create_refresh_token(data={"sub": email})
-    return RedirectResponse(url=f"{os.getenv('FRONTEND_URL')}/oauth-success?token={access_token}&refresh={refresh_token}")
+    return await oauth_success(db, email)
 
 # -----------------------------
 # JWT Authentication Endpoints
 # -----------------------------
 @router.post("/register", response_model=TokenResponse, summary="Register a new user and return tokens")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.username == user.username))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already taken!")
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     new_user = User(username=user.username, password=hashed_password, role="user")
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     access_token = create_access_token(data={"sub": new_user.username}, expires_delta=timedelta(minutes=60))
     refresh_token = create_refresh_token(data={"sub": new_user.username})
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=TokenResponse, summary="Login user and return JWT tokens")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.password):
+async def login(user: UserLogin, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.username == user.username))
+    db_user = result.scalars().first()
+    if not db_user or not await verify_password(user.password, db_user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if needs_rehash(db_user.password):
+        background_tasks.add_task(rehash_password, db_user.id, user.password)
     access_token = create_access_token(data={"sub": db_user.username}, expires_delta=timedelta(minutes=60))
     refresh_token = create_refresh_token(data={"sub": db_user.username})
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
-@router.post("/logout", summary="Client-side logout", operation_id="logout")
-def logout():
+@router.post("/logout", summary="Revoke the access token and an optional refresh token", operation_id="logout")
+async def logout(
+    refresh_token: Optional[str] = None,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
+    for raw in (token, refresh_token):
+        if not raw:
+            continue
+        try:
+            claims = decode_token(raw)
+        except JWTError:
+            continue
+        await revocation_store.revoke(claims.get("jti"), token_expires_at(claims), db)
     return {"message": "Logout successful. Please remove tokens from your client storage."}
 
-@router.post("/refresh", response_model=TokenResponse, summary="Refresh JWT token")
-def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+@router.post("/refresh", response_model=TokenResponse, summary="Rotate the refresh token and issue a new access token")
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async_db)):
     payload = verify_refresh_token(refresh_token)
     username = payload.get("sub")
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-    db_user = db.query(User).filter(User.username == username).first()
+    # ✅ Each refresh token is single use: revoking it fails if it was already spent or logged out
+    if not await revocation_store.revoke(payload.get("jti"), token_expires_at(payload), db):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token has been revoked")
+    result = await db.execute(select(User).where(User.username == username))
+    db_user = result.scalars().first()
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     new_access_token = create_access_token(data={"sub": db_user.username}, expires_delta=timedelta(minutes=60))
-    return {"access_token": new_access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    new_refresh_token = create_refresh_token(data={"sub": db_user.username})
+    return {"access_token": new_access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse, summary="Get current logged-in user")
-def get_me(current_user: User = Depends(get_current_user)):
-    return UserResponse(username=current_user.username, role=current_user.role)
+async def get_me(current_user: User = Depends(get_current_user)):
+    return current_user
 
 @router.get("/admin-only", summary="Admin-only test route", operation_id="admin_only")
-def admin_only_route(admin: User = Depends(require_admin)):
+async def admin_only_route(admin: User = Depends(require_admin)):
     return {"message": "Welcome, Admin!"}
+
+@router.get("/hash-stats", summary="Password hashing pool metrics (admin only)", operation_id="hash_stats")
+async def get_hash_stats(admin: User = Depends(require_admin)):
+    return hashing_pool.stats()
@@ -1,12 +1,18 @@
+import os
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models import User
+from cache import InMemoryCache, get_cached_user, cache_user
+from revocation import revocation_store
 from schemas import TokenData
 
 SECRET_KEY = "your-secret-key"  # Change this in production!
@@ -14,34 +20,74 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 REFRESH_TOKEN_EXPIRE_MINUTES = 1440  # 1 day
 
+# The only CryptContext in the app; hashing.py runs it on a thread pool
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", 10000))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 300))
+
+# Verified claims keyed by (secret, algorithm, token); entries never outlive the token's `exp`
+token_cache = InMemoryCache(max_size=TOKEN_CACHE_MAX_SIZE, ttl=TOKEN_CACHE_TTL)
+
+def decode_token(token: str, secret: str = SECRET_KEY, algorithm: str = ALGORITHM) -> dict:
+    """jwt.decode with a cache of verified claims. Raises JWTError like jwt.decode."""
+    key = (secret, algorithm, token)
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+    claims = jwt.decode(token, secret, algorithms=[algorithm])
+    ttl = claims["exp"] - time.time() if "exp" in claims else TOKEN_CACHE_TTL
+    if ttl > 0:
+        token_cache.set(key, claims, ttl=min(ttl, TOKEN_CACHE_TTL))
+    return claims
+
+def token_subject(scope) -> Optional[str]:
+    """The `sub` of a valid bearer token in an ASGI scope, without touching the database."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                return decode_token(token).get("sub")
+            except JWTError:
+                return None
+    return None
+
+def token_expires_at(claims: dict) -> datetime:
+    if "exp" in claims:
+        return datetime.utcfromtimestamp(claims["exp"])
+    return datetime.utcnow() + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
+
+def create_token(data: dict, token_type: str, expires_delta: timedelta):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    expire = datetime.utcnow() + expires_delta
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": token_type})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    return create_token(data, "access", expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return create_token(data, "refresh", expires_delta or timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
 
 def verify_refresh_token(token: str):
     """
     Decode and verify the given refresh token. Raises an HTTP 401 error if the token is invalid.
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        payload = decode_token(token)
     except JWTError:
+        payload = None
+    if payload is None or payload.get("type", "refresh") != "refresh":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -49,9 +95,7 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    print(f"🔍 Received Token: {token}")  # Debugging line
-
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -59,7 +103,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         role: str = payload.get("role")
 
@@ -69,8 +113,19 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.username == username).first()
+    if await revocation_store.is_revoked(payload.get("jti"), db):
+        raise credentials_exception
+
+    # Writes committed on this session pin the user's reads to the primary (see replicas.py)
+    db.info["subject"] = username
+
+    cached = get_cached_user(username)
+    if cached is not None:
+        return cached
+
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
 
-    return user
+    return cache_user(user)
@@ -1,57 +1,325 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from models import Habit, User
-from schemas import HabitCreate, HabitUpdate, HabitResponse
-from database import get_db
-from routes.auth_utils import get_current_user  
+import hashlib
+import logging
+from datetime import date, datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Habit, HabitCompletion, HabitStats, User
+from schemas import (
+    HabitCreate, HabitUpdate, HabitResponse, CompletionCreate, CompletionResponse, StreakResponse,
+    HabitBulkCreate, HabitBulkUpdate, HabitBulkDelete, BulkItemResult, BulkResponse,
+)
+from database import get_async_db
+from routes.auth_utils import get_current_user
+from replicas import get_read_db
+from streaks import apply_completion, apply_undo, empty_stats, is_streak_alive
+from export import ExportFormat, export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_response, paginate, parse_fields, split_page
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+HABIT_FIELDS = set(Habit.__table__.columns.keys())
+
+# Columns behind HabitResponse, selected as plain rows by the list fast path
+RESPONSE_COLUMNS = [name for name in HabitResponse.model_fields if name != "stats"]
+STATS_COLUMNS = ["current_streak", "longest_streak", "last_completed_on", "total_completions"]
+STATS_OFFSET = len(RESPONSE_COLUMNS)
+
+def habit_list_query(sort: str):
+    """Habit columns, then the stats row's key and columns, then the sort key if not already selected."""
+    extra = [] if sort in RESPONSE_COLUMNS else [getattr(Habit, sort)]
+    return (
+        select(
+            *(getattr(Habit, name) for name in RESPONSE_COLUMNS),
+            HabitStats.habit_id, *(getattr(HabitStats, name) for name in STATS_COLUMNS),
+            *extra,
+        )
+        .outerjoin(HabitStats, HabitStats.habit_id == Habit.id)
+    )
+
+def habit_to_dict(row, today: date) -> dict:
+    """Row-to-dict equivalent of HabitResponse.model_validate(habit).model_dump(), by position."""
+    item = dict(zip(RESPONSE_COLUMNS, row))
+    if row[STATS_OFFSET] is None:
+        item["stats"] = None
+    else:
+        stats = dict(zip(STATS_COLUMNS, row[STATS_OFFSET + 1:]))
+        if not is_streak_alive(stats["last_completed_on"], today):
+            stats["current_streak"] = 0
+        item["stats"] = stats
+    return item
+
+async def get_user_habit(db: AsyncSession, habit_id: int, user_id: int):
+    result = await db.execute(select(Habit).where(Habit.id == habit_id, Habit.user_id == user_id))
+    habit = result.scalars().first()
+    if not habit:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    return habit
+
+# -----------------------------
+# Conditional GET: every habit write bumps users.habits_version, and reads derive an ETag
+# from it, so an unchanged poll costs one primary-key lookup and no serialization.
+# -----------------------------
+async def bump_habits_version(db: AsyncSession, user_id: int):
+    # Keep users.updated_at untouched, it tracks changes to the user row itself
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(habits_version=User.habits_version + 1, updated_at=User.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+async def habits_etag(request: Request, response: Response, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)) -> str:
+    result = await db.execute(select(User.habits_version).where(User.id == current_user.id))
+    version = result.scalar() or 0
+    # The date is part of the tag because current streaks expire at midnight without a write
+    variant = hashlib.blake2s(f"{request.url.path}?{request.url.query}".encode(), digest_size=6).hexdigest()
+    etag = f'W/"{current_user.id}-{version}-{datetime.utcnow().date():%Y%m%d}-{variant}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return etag
+
 # ✅ Create a new habit
 @router.post("/", response_model=HabitResponse)
-def create_habit(habit: HabitCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_habit = Habit(**habit.dict(), user_id=current_user.id)  
+async def create_habit(habit: HabitCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    db_habit = Habit(**habit.dict(), user_id=current_user.id, stats=HabitStats(current_streak=0, longest_streak=0, total_completions=0))
     db.add(db_habit)
-    db.commit()
-    db.refresh(db_habit)
+    await bump_habits_version(db, current_user.id)
+    await db.commit()
+    await db.refresh(db_habit)
     return db_habit
 
+# -----------------------------
+# Bulk Endpoints
+# -----------------------------
+async def owned_habit_ids(db: AsyncSession, habit_ids, user_id: int) -> set:
+    result = await db.execute(select(Habit.id).where(Habit.id.in_(set(habit_ids)), Habit.user_id == user_id))
+    return set(result.scalars().all())
+
+async def insert_habits(db: AsyncSession, rows):
+    result = await db.scalars(insert(Habit).returning(Habit.id, sort_by_parameter_order=True), rows)
+    ids = result.all()
+    await db.execute(insert(HabitStats), [{"habit_id": habit_id, **empty_stats(habit_id)} for habit_id in ids])
+    return ids
+
+async def update_habits(db: AsyncSession, rows):
+    await db.execute(update(Habit), rows)
+    return [row["id"] for row in rows]
+
+async def delete_habits(db: AsyncSession, rows):
+    ids = [row["id"] for row in rows]
+    await db.execute(delete(Habit).where(Habit.id.in_(ids)))
+    return ids
+
+def bulk_error(exc: DBAPIError) -> str:
+    """A fixed message for the client; the driver's text (constraints, SQL, values) only goes to the log."""
+    logger.warning("Bulk habit write failed: %s", exc.orig)
+    return "duplicate or invalid reference" if isinstance(exc, IntegrityError) else "invalid value"
+
+async def apply_bulk(db: AsyncSession, user_id: int, mode: str, pending, write, label: str, results: list) -> BulkResponse:
+    """
+    Write all pending (index, row) pairs in one statement. In partial mode a failed batch is
+    retried row by row inside savepoints so one bad row does not sink the others.
+    """
+    if pending:
+        try:
+            ids = await write(db, [row for _, row in pending])
+            results.extend(BulkItemResult(index=index, id=item_id, status=label) for (index, _), item_id in zip(pending, ids))
+        except DBAPIError as exc:
+            await db.rollback()
+            if mode == "atomic":
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Bulk write failed, nothing was saved: {bulk_error(exc)}")
+            for index, row in pending:
+                try:
+                    async with db.begin_nested():
+                        item_id, = await write(db, [row])
+                    results.append(BulkItemResult(index=index, id=item_id, status=label))
+                except DBAPIError as row_exc:
+                    results.append(BulkItemResult(index=index, id=row.get("id"), status="error", error=bulk_error(row_exc)))
+        await bump_habits_version(db, user_id)
+        await db.commit()
+
+    results.sort(key=lambda result: result.index)
+    failed = sum(result.status == "error" for result in results)
+    return BulkResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+def split_owned(items, owned: set, mode: str, results: list):
+    """Record not-found errors for ids the user does not own; atomic mode rejects the whole batch."""
+    missing = [item_id for _, item_id in items if item_id not in owned]
+    if missing and mode == "atomic":
+        raise HTTPException(status_code=404, detail=f"Habits not found: {sorted(set(missing))}")
+    results.extend(BulkItemResult(index=index, id=item_id, status="error", error="Habit not found") for index, item_id in items if item_id not in owned)
+    return [(index, item_id) for index, item_id in items if item_id in owned]
+
+# ✅ Create many habits in one INSERT ... RETURNING
+@router.post("/bulk", response_model=BulkResponse, status_code=status.HTTP_201_CREATED)
+async def bulk_create_habits(payload: HabitBulkCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    pending = [(index, {**item.dict(), "user_id": current_user.id}) for index, item in enumerate(payload.items)]
+    return await apply_bulk(db, current_user.id, payload.mode, pending, insert_habits, "created", [])
+
+# ✅ Update many habits with one executemany
+@router.put("/bulk", response_model=BulkResponse)
+async def bulk_update_habits(payload: HabitBulkUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    owned = await owned_habit_ids(db, [item.id for item in payload.items], current_user.id)
+    results = []
+    keep = split_owned([(index, item.id) for index, item in enumerate(payload.items)], owned, payload.mode, results)
+    now = datetime.utcnow()
+    pending = [(index, {**payload.items[index].dict(exclude_unset=True), "updated_at": now}) for index, _ in keep]
+    return await apply_bulk(db, current_user.id, payload.mode, pending, update_habits, "updated", results)
+
+# ✅ Delete many habits with one DELETE
+@router.post("/bulk/delete", response_model=BulkResponse)
+async def bulk_delete_habits(payload: HabitBulkDelete, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    owned = await owned_habit_ids(db, payload.ids, current_user.id)
+    results = []
+    keep = split_owned(list(enumerate(payload.ids)), owned, payload.mode, results)
+    pending = [(index, {"id": habit_id}) for index, habit_id in keep]
+    return await apply_bulk(db, current_user.id, payload.mode, pending, delete_habits, "deleted", results)
+
 # ✅ Get all habits for the logged-in user
-@router.get("", response_model=list[HabitResponse])  
+@router.get("", response_model=list[HabitResponse])
 @router.get("/", response_model=list[HabitResponse])
-def get_habits(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return db.query(Habit).filter(Habit.user_id == current_user.id).all()
+async def get_habits(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header."),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: Literal["id", "created_at"] = "id",
+    completed: Optional[bool] = None,
+    frequency: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,title,completed."),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    etag: str = Depends(habits_etag),
+):
+    columns = parse_fields(fields, HABIT_FIELDS)
+    if columns:
+        # Projection: select plain columns (plus the keyset columns) instead of ORM entities
+        keys = list(dict.fromkeys(columns + ["id", sort]))
+        query = select(*(getattr(Habit, name) for name in keys))
+    else:
+        # Fast path: the HabitResponse columns and the stats row as plain tuples
+        query = habit_list_query(sort)
+
+    query = query.where(Habit.user_id == current_user.id)
+    if completed is not None:
+        query = query.where(Habit.completed == completed)
+    if frequency is not None:
+        query = query.where(Habit.frequency == frequency)
+
+    result = await db.execute(paginate(query, Habit, sort, cursor, limit))
+    rows, next_cursor = split_page(result.all(), sort, limit)
+
+    if columns:
+        items = [dict(zip(columns, row)) for row in rows]
+    else:
+        today = datetime.utcnow().date()
+        items = [habit_to_dict(row, today) for row in rows]
+    return page_response(items, next_cursor, {"ETag": etag, "Cache-Control": response.headers["Cache-Control"]})
+
+# ✅ Stream habits as NDJSON or CSV (admins may export every user's habits)
+@router.get("/export")
+async def export_habits(
+    format: ExportFormat = "ndjson",
+    updated_since: Optional[datetime] = Query(None, description="Only export habits changed after this time (for incremental pulls)."),
+    all_users: bool = Query(False, description="Admin only: export habits of every user."),
+    current_user: User = Depends(get_current_user),
+):
+    if all_users and current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    columns = list(Habit.__table__.columns.keys())
+    query = select(*Habit.__table__.columns).order_by(Habit.updated_at, Habit.id)
+    if not all_users:
+        query = query.where(Habit.user_id == current_user.id)
+    if updated_since is not None:
+        query = query.where(Habit.updated_at > updated_since)
+    return export_response(query, columns, format, "habits")
+
+# ✅ Get current and longest streaks for all of the user's habits
+@router.get("/streaks", response_model=list[StreakResponse])
+async def get_streaks(db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user), etag: str = Depends(habits_etag)):
+    result = await db.execute(select(HabitStats).join(Habit).where(Habit.user_id == current_user.id))
+    return result.scalars().all()
 
 # ✅ Get a single habit by ID
 @router.get("/{habit_id}", response_model=HabitResponse)
-def get_habit(habit_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    habit = db.query(Habit).filter(Habit.id == habit_id, Habit.user_id == current_user.id).first()
-    if not habit:
-        raise HTTPException(status_code=404, detail="Habit not found")
-    return habit
+async def get_habit(habit_id: int, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user), etag: str = Depends(habits_etag)):
+    return await get_user_habit(db, habit_id, current_user.id)
 
 # ✅ Update a habit
 @router.put("/{habit_id}", response_model=HabitResponse)
-def update_habit(habit_id: int, habit_update: HabitUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    habit = db.query(Habit).filter(Habit.id == habit_id, Habit.user_id == current_user.id).first()
-    if not habit:
-        raise HTTPException(status_code=404, detail="Habit not found")
-    
+async def update_habit(habit_id: int, habit_update: HabitUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    habit = await get_user_habit(db, habit_id, current_user.id)
+
     for key, value in habit_update.dict(exclude_unset=True).items():
         setattr(habit, key, value)
 
-    db.commit()
-    db.refresh(habit)
+    await bump_habits_version(db, current_user.id)
+    await db.commit()
+    await db.refresh(habit)
     return habit
 
 # ✅ Delete a habit
 @router.delete("/{habit_id}")
-def delete_habit(habit_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    habit = db.query(Habit).filter(Habit.id == habit_id, Habit.user_id == current_user.id).first()
-    if not habit:
-        raise HTTPException(status_code=404, detail="Habit not found")
+async def delete_habit(habit_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    habit = await get_user_habit(db, habit_id, current_user.id)
 
-    db.delete(habit)
-    db.commit()
+    await db.delete(habit)
+    await bump_habits_version(db, current_user.id)
+    await db.commit()
     return {"message": "Habit deleted successfully"}
 
+# ✅ Record a check-in (idempotent per day)
+@router.post("/{habit_id}/completions", response_model=CompletionResponse, status_code=status.HTTP_201_CREATED)
+async def complete_habit(habit_id: int, completion: CompletionCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    await get_user_habit(db, habit_id, current_user.id)
+    day = completion.day or datetime.utcnow().date()
+
+    result = await db.execute(select(HabitCompletion).where(HabitCompletion.habit_id == habit_id, HabitCompletion.day == day))
+    existing = result.scalars().first()
+    if existing:
+        return existing
+
+    db_completion = HabitCompletion(habit_id=habit_id, day=day)
+    try:
+        async with db.begin_nested():
+            db.add(db_completion)
+    except IntegrityError:
+        # A concurrent check-in for the same day committed first; answer like the lookup above
+        result = await db.execute(select(HabitCompletion).where(HabitCompletion.habit_id == habit_id, HabitCompletion.day == day))
+        return result.scalars().first()
+    await apply_completion(db, habit_id, day)
+    await bump_habits_version(db, current_user.id)
+    await db.commit()
+    return db_completion
+
+# ✅ Undo a check-in
+@router.delete("/{habit_id}/completions/{day}")
+async def undo_completion(habit_id: int, day: date, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    await get_user_habit(db, habit_id, current_user.id)
+
+    result = await db.execute(delete(HabitCompletion).where(HabitCompletion.habit_id == habit_id, HabitCompletion.day == day))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Completion not found")
+    await apply_undo(db, habit_id)
+    await bump_habits_version(db, current_user.id)
+    await db.commit()
+    return {"message": "Completion removed successfully"}
+
+# ✅ Get current and longest streak for a habit
+@router.get("/{habit_id}/streak", response_model=StreakResponse)
+async def get_streak(habit_id: int, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user), etag: str = Depends(habits_etag)):
+    habit = await get_user_habit(db, habit_id, current_user.id)
+    return habit.stats or empty_stats(habit_id)
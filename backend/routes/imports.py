@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+from typing import Literal, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ImportJob, ImportRowError, User
+from schemas import ImportJobResponse, ImportRowErrorResponse
+from database import get_async_db
+from routes.auth_utils import get_current_user
+from imports import detect_format, run_import_file
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_response, paginate, split_page
+
+router = APIRouter()
+
+IMPORT_MAX_UPLOAD_BYTES = int(os.getenv("IMPORT_MAX_UPLOAD_BYTES", 2 * 1024 ** 3))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+async def get_user_job(db: AsyncSession, job_id: int, user: User) -> ImportJob:
+    job = await db.get(ImportJob, job_id)
+    if job is None or (job.user_id != user.id and user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+# ✅ Upload a CSV or NDJSON file of habits and check-ins; it is imported in the background
+@router.post("", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+@router.post("/", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_import(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(..., description="CSV with a header row, or NDJSON (one habit per line)."),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the file extension (.ndjson/.jsonl/.json, else csv)."),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    if file.size is not None and file.size > IMPORT_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Import file is too large")
+
+    # The upload is spooled to disk by the form parser; copy it out so it outlives the request
+    target = tempfile.NamedTemporaryFile(prefix="import-", delete=False)
+    try:
+        with target:
+            await run_in_threadpool(shutil.copyfileobj, file.file, target, UPLOAD_CHUNK_BYTES)
+        job = ImportJob(user_id=current_user.id, filename=file.filename, format=format or detect_format(file.filename), status="pending")
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+    except BaseException:
+        # run_import_file removes the file once queued; until then it is ours to clean up
+        os.remove(target.name)
+        raise
+    background_tasks.add_task(run_import_file, job.id, target.name, current_user.role == "admin")
+    return job
+
+# ✅ Progress and totals of an import
+@router.get("/{job_id}", response_model=ImportJobResponse)
+async def get_import(job_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    return await get_user_job(db, job_id, current_user)
+
+# ✅ Rows that failed validation, with their line numbers (the first IMPORT_MAX_ERRORS are kept)
+@router.get("/{job_id}/errors", response_model=list[ImportRowErrorResponse])
+async def get_import_errors(
+    job_id: int,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header."),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    await get_user_job(db, job_id, current_user)
+    query = select(ImportRowError.id, ImportRowError.line, ImportRowError.error).where(ImportRowError.job_id == job_id)
+    result = await db.execute(paginate(query, ImportRowError, "id", cursor, limit))
+    rows, next_cursor = split_page(result.all(), "id", limit)
+    return page_response([{"line": row.line, "error": row.error} for row in rows], next_cursor)
@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Habit, Reminder, User
+from schemas import ReminderCreate, ReminderUpdate, ReminderResponse
+from database import get_async_db
+from routes.auth_utils import get_current_user
+from replicas import get_read_db
+from routes.habits import get_user_habit
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, split_page
+from scheduler import next_fire_time, reminder_scheduler
+
+router = APIRouter()
+
+async def get_user_reminder(db: AsyncSession, reminder_id: int, user_id: int):
+    result = await db.execute(select(Reminder).join(Reminder.habit).where(Reminder.id == reminder_id, Habit.user_id == user_id))
+    reminder = result.scalars().first()
+    if not reminder:
+        raise HTTPException(status_code=404, detail="Reminder not found")
+    return reminder
+
+def reschedule(reminder: Reminder):
+    reminder.next_fire_at = next_fire_time(reminder.time_of_day, reminder.timezone, datetime.utcnow()) if reminder.enabled else None
+
+# ✅ List the user's reminders (optionally for one habit)
+@router.get("", response_model=list[ReminderResponse])
+@router.get("/", response_model=list[ReminderResponse])
+async def get_reminders(
+    response: Response,
+    habit_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header."),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    query = select(Reminder).join(Reminder.habit).where(Habit.user_id == current_user.id)
+    if habit_id is not None:
+        query = query.where(Reminder.habit_id == habit_id)
+    result = await db.execute(paginate(query, Reminder, "id", cursor, limit))
+    rows, next_cursor = split_page(result.scalars().all(), "id", limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
+# ✅ Create a reminder for one of the user's habits
+@router.post("", response_model=ReminderResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=ReminderResponse, status_code=status.HTTP_201_CREATED)
+async def create_reminder(reminder: ReminderCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    await get_user_habit(db, reminder.habit_id, current_user.id)
+    db_reminder = Reminder(**reminder.dict())
+    reschedule(db_reminder)
+    db.add(db_reminder)
+    await db.commit()
+    await db.refresh(db_reminder)
+    reminder_scheduler.schedule(db_reminder.id, db_reminder.next_fire_at)
+    return db_reminder
+
+# ✅ Get a single reminder
+@router.get("/{reminder_id}", response_model=ReminderResponse)
+async def get_reminder(reminder_id: int, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    return await get_user_reminder(db, reminder_id, current_user.id)
+
+# ✅ Update a reminder (time, time zone or enabled flag)
+@router.put("/{reminder_id}", response_model=ReminderResponse)
+async def update_reminder(reminder_id: int, reminder_update: ReminderUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    reminder = await get_user_reminder(db, reminder_id, current_user.id)
+
+    for key, value in reminder_update.dict(exclude_unset=True).items():
+        if value is not None:
+            setattr(reminder, key, value)
+    reschedule(reminder)
+
+    await db.commit()
+    await db.refresh(reminder)
+    reminder_scheduler.schedule(reminder.id, reminder.next_fire_at)
+    return reminder
+
+# ✅ Delete a reminder
+@router.delete("/{reminder_id}")
+async def delete_reminder(reminder_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    reminder = await get_user_reminder(db, reminder_id, current_user.id)
+    await db.delete(reminder)
+    await db.commit()
+    return {"message": "Reminder deleted successfully"}
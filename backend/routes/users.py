@@ -1,33 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
+from datetime import datetime
 from models import User
-from schemas import UserCreate, UserLogin, TokenResponse, UserResponse, MessageResponse
-from database import get_db
-from passlib.context import CryptContext
-from .auth_utils import create_access_token, verify_password, get_current_user
+from schemas import UserCreate, UserLogin, TokenResponse, UserResponse, UserRoleUpdate, MessageResponse
+from database import get_async_db
+from replicas import get_read_db
+from hashing import hash_password, verify_password, needs_rehash, rehash_password
+from cache import invalidate_user, user_cache_stats
+from export import ExportFormat, export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_response, paginate, parse_fields, split_page
+from .auth_utils import create_access_token, get_current_user
 from datetime import timedelta
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Columns that may be projected with ?fields= (never the password hash)
+USER_FIELDS = {"id", "username", "role"}
 
 # Admin Authorization Helper (Prevents Circular Imports)
-def require_admin(current_user: User = Depends(get_current_user)):
+async def require_admin(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return current_user
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED, summary="Register a new user")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.username == user.username))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already taken")
     
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(username=user.username, password=hashed_password, role=user.role)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     access_token = create_access_token(
         data={"sub": db_user.username, "role": db_user.role},
@@ -36,10 +46,13 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=TokenResponse, summary="Login user and return JWT token")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.password):
+async def login(user: UserLogin, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.username == user.username))
+    db_user = result.scalars().first()
+    if not db_user or not await verify_password(user.password, db_user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if needs_rehash(db_user.password):
+        background_tasks.add_task(rehash_password, db_user.id, user.password)
     
     access_token = create_access_token(
         data={"sub": db_user.username, "role": db_user.role}
@@ -47,27 +60,72 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse, summary="Get current logged-in user")
-def get_me(current_user: User = Depends(get_current_user)):
-    return {"username": current_user.username, "role": current_user.role}
+async def get_me(current_user: User = Depends(get_current_user)):
+    return current_user
 
 @router.get("/", response_model=List[UserResponse], summary="Get all users (admin only)")
-def get_all_users(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
-    return db.query(User).all()
+async def get_all_users(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header."),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    role: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,username."),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(require_admin),
+):
+    # Plain rows of the requested (or UserResponse) columns, encoded without ORM objects
+    columns = parse_fields(fields, USER_FIELDS) or list(UserResponse.model_fields)
+    query = select(*(getattr(User, name) for name in dict.fromkeys(columns + ["id"])))
+    if role is not None:
+        query = query.where(User.role == role)
+
+    result = await db.execute(paginate(query, User, "id", cursor, limit))
+    rows, next_cursor = split_page(result.all(), "id", limit)
+    return page_response([dict(zip(columns, row)) for row in rows], next_cursor)
+
+@router.get("/export", summary="Stream all users as NDJSON or CSV (admin only)")
+async def export_users(
+    format: ExportFormat = "ndjson",
+    updated_since: Optional[datetime] = Query(None, description="Only export users changed after this time (for incremental pulls)."),
+    current_user: User = Depends(require_admin),
+):
+    columns = ["id", "username", "role", "updated_at"]
+    query = select(*(getattr(User, name) for name in columns)).order_by(User.updated_at, User.id)
+    if updated_since is not None:
+        query = query.where(User.updated_at > updated_since)
+    return export_response(query, columns, format, "users")
 
 @router.delete("/{user_id}", response_model=MessageResponse, summary="Delete a user (admin only)")
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(require_admin)):
     # Prevent an admin from deleting themselves.
     if current_user.id == user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Admin cannot delete themselves")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Load habits up front so the delete-orphan cascade does not lazy load
+    result = await db.execute(select(User).options(selectinload(User.habits)).where(User.id == user_id))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    invalidate_user(user.username)
     return {"message": "User deleted successfully"}
 
+@router.put("/{user_id}/role", response_model=UserResponse, summary="Change a user's role (admin only)")
+async def update_user_role(user_id: int, role_update: UserRoleUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(require_admin)):
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    user.role = role_update.role
+    await db.commit()
+    invalidate_user(user.username)
+    return user
+
+@router.get("/cache-stats", summary="User cache hit/miss counters (admin only)")
+async def get_user_cache_stats(admin: User = Depends(require_admin)):
+    return user_cache_stats()
+
 @router.get("/admin-only", summary="Admin-only test route")
-def admin_route(admin: User = Depends(require_admin)):
+async def admin_route(admin: User = Depends(require_admin)):
     return {"message": "Welcome, Admin!"}
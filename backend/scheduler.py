@@ -0,0 +1,283 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import bindparam, select, update
+from database import AsyncSessionLocal
+from http_client import request
+from metrics import Histogram
+from models import Habit, Reminder
+
+logger = logging.getLogger(__name__)
+
+REMINDER_SCHEDULER_ENABLED = os.getenv("REMINDER_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+REMINDER_TICK_SECONDS = float(os.getenv("REMINDER_TICK_SECONDS", 1))
+REMINDER_LOOKAHEAD_SECONDS = float(os.getenv("REMINDER_LOOKAHEAD_SECONDS", 120))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", 1000))
+REMINDER_MAX_LATENESS_SECONDS = float(os.getenv("REMINDER_MAX_LATENESS_SECONDS", 3600))
+REMINDER_RETRY_SECONDS = float(os.getenv("REMINDER_RETRY_SECONDS", 30))
+REMINDER_WEBHOOK_URL = os.getenv("REMINDER_WEBHOOK_URL")
+
+LOAD_BATCH_SIZE = 10000
+
+REMINDER_LAG = Histogram(
+    "reminder_dispatch_lag_seconds", "Delay between a reminder's due time and its dispatch.",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900),
+)
+
+def next_fire_time(time_of_day, tz_name: str, after: datetime) -> datetime:
+    """
+    Next instant strictly after `after` at which the wall clock in `tz_name` reads `time_of_day`.
+    Both `after` and the result are naive UTC, like every other timestamp in the schema.
+    """
+    zone = ZoneInfo(tz_name)
+    local = after.replace(tzinfo=timezone.utc).astimezone(zone)
+    candidate = datetime.combine(local.date(), time_of_day, tzinfo=zone)
+    if candidate <= local:
+        candidate = datetime.combine(local.date() + timedelta(days=1), time_of_day, tzinfo=zone)
+    return candidate.astimezone(timezone.utc).replace(tzinfo=None)
+
+# -----------------------------
+# Delivery sinks
+# -----------------------------
+class ReminderSink:
+    """Interface for reminder delivery. Subclass this to push to email, mobile push, a queue, ..."""
+
+    async def send(self, reminders: list) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class LogSink(ReminderSink):
+    async def send(self, reminders):
+        for reminder in reminders:
+            logger.info("Reminder %(id)s for user %(user_id)s: %(habit_title)s (due %(due_at)s)", reminder)
+
+class WebhookSink(ReminderSink):
+    """POST each batch as JSON to `url`, e.g. a local notification relay, over the shared client."""
+
+    def __init__(self, url: str, timeout: float = 5):
+        self.url = url
+        self.timeout = timeout
+
+    async def send(self, reminders):
+        response = await request("POST", self.url, json={"reminders": reminders}, timeout=self.timeout)
+        response.raise_for_status()
+
+# -----------------------------
+# Scheduler
+# -----------------------------
+class ReminderScheduler:
+    """
+    Keeps only the reminders due in the next `lookahead` seconds in memory, in a min-heap of
+    (due, id). The window is refilled by a range scan on the `next_fire_at` index every
+    lookahead/2 seconds, so memory and work scale with reminders per minute, not table size.
+
+    Each tick pops everything that is due and claims it with one query per batch. Rows whose
+    `next_fire_at` is still due are locked (SKIP LOCKED on Postgres), advanced to their next
+    local occurrence and committed, and only then handed to the sink. If the sink fails, a
+    compensating update puts them back to their due time for a retry. Heap entries made stale
+    by an edit, or already claimed by another worker, no longer match and are dropped.
+    """
+
+    def __init__(self, sink: ReminderSink, tick: float, lookahead: float, batch_size: int, max_lateness: float, retry: float):
+        self.sink = sink
+        self.tick = tick
+        self.lookahead = lookahead
+        self.batch_size = batch_size
+        self.max_lateness = max_lateness
+        self.retry = retry
+        self.heap = []
+        self.loaded_until = None  # every reminder due before this has been pushed onto the heap
+        self.changes_since = None
+        self.dispatched = 0
+        self.expired = 0
+        self.failed = 0
+        self.task = None
+        self.wakeup = None
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run(), name="reminder-scheduler")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.sink.close()
+
+    def schedule(self, reminder_id: int, due):
+        """Push a reminder created or edited in this process if it falls inside the loaded window."""
+        if due is not None and self.loaded_until is not None and due < self.loaded_until:
+            heapq.heappush(self.heap, (due, reminder_id))
+            if self.wakeup is not None:
+                self.wakeup.set()
+
+    async def run(self):
+        next_load = datetime.min
+        while True:
+            try:
+                if datetime.utcnow() >= next_load:
+                    next_load = datetime.utcnow() + timedelta(seconds=self.lookahead / 2)
+                    await self.load()
+                while await self.fire_due():
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reminder scheduler tick failed")
+            await self.sleep()
+
+    async def sleep(self):
+        timeout = self.tick
+        if self.heap:
+            timeout = min(timeout, max(0.0, (self.heap[0][0] - datetime.utcnow()).total_seconds()))
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def load(self):
+        started = datetime.utcnow()
+        until = started + timedelta(seconds=self.lookahead)
+        window = select(Reminder.id, Reminder.next_fire_at).where(Reminder.next_fire_at < until)
+        if self.loaded_until is not None:
+            window = window.where(Reminder.next_fire_at >= self.loaded_until)
+        queries = [window]
+        if self.changes_since is not None:
+            # Reminders edited by other workers into the part of the window already loaded
+            queries.append(
+                select(Reminder.id, Reminder.next_fire_at)
+                .where(Reminder.updated_at >= self.changes_since, Reminder.next_fire_at < self.loaded_until)
+            )
+
+        async with AsyncSessionLocal() as db:
+            for query in queries:
+                result = await db.stream(query.execution_options(yield_per=LOAD_BATCH_SIZE))
+                async for rows in result.partitions():
+                    for reminder_id, due in rows:
+                        heapq.heappush(self.heap, (due, reminder_id))
+        self.loaded_until = until
+        # Overlap one refill period so edits committed just after this scan are still caught
+        self.changes_since = started - timedelta(seconds=self.lookahead / 2)
+
+    async def fire_due(self) -> int:
+        """Claim and dispatch one batch of due reminders. Returns how many heap entries were popped."""
+        now = datetime.utcnow()
+        due_ids = set()
+        while self.heap and self.heap[0][0] <= now and len(due_ids) < self.batch_size:
+            due_ids.add(heapq.heappop(self.heap)[1])
+        if due_ids:
+            await self.dispatch(due_ids, now)
+        return len(due_ids)
+
+    async def dispatch(self, reminder_ids: set, now: datetime):
+        batch, claimed = await self.claim(reminder_ids, now)
+        if not batch:
+            return
+        # The claim is committed, so no row lock or connection is held while the sink runs
+        try:
+            await self.sink.send(batch)
+        except Exception:
+            logger.exception("Reminder sink failed for %d reminders, retrying in %ss", len(batch), self.retry)
+            self.failed += len(batch)
+            await self.release(claimed)
+            retry_at = now + timedelta(seconds=self.retry)
+            for row in claimed:
+                heapq.heappush(self.heap, (retry_at, row["row_id"]))
+            return
+        self.dispatched += len(batch)
+
+    async def claim(self, reminder_ids: set, now: datetime):
+        """
+        Lock the due rows, advance them to their next occurrence and commit. Returns the batch
+        for the sink and, for each reminder in it, what `release` needs to put it back.
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    Reminder.id, Reminder.time_of_day, Reminder.timezone, Reminder.next_fire_at, Reminder.last_fired_at,
+                    Reminder.updated_at, Habit.id.label("habit_id"), Habit.title, Habit.user_id,
+                )
+                .join(Reminder.habit)
+                .where(Reminder.id.in_(reminder_ids), Reminder.next_fire_at <= now)
+                .with_for_update(of=Reminder, skip_locked=True)
+            )
+            rows = result.all()
+            if not rows:
+                return [], []
+
+            batch, claimed, advanced = [], [], []
+            for row in rows:
+                next_fire_at = next_fire_time(row.time_of_day, row.timezone, now)
+                lag = (now - row.next_fire_at).total_seconds()
+                if lag <= self.max_lateness:
+                    REMINDER_LAG.observe(lag)
+                    batch.append({
+                        "id": row.id, "habit_id": row.habit_id, "habit_title": row.title, "user_id": row.user_id,
+                        "due_at": row.next_fire_at.isoformat(), "timezone": row.timezone,
+                    })
+                    claimed.append({"row_id": row.id, "claimed": next_fire_at, "due": row.next_fire_at, "last_fired": row.last_fired_at})
+                else:
+                    self.expired += 1
+                advanced.append({
+                    "id": row.id,
+                    "next_fire_at": next_fire_at,
+                    "last_fired_at": now,
+                    "updated_at": row.updated_at,  # updated_at tracks user edits only
+                })
+
+            # One executemany UPDATE by primary key for the whole batch
+            await db.execute(update(Reminder), advanced)
+            await db.commit()
+            return batch, claimed
+
+    async def release(self, claimed: list):
+        """Put undelivered reminders back to their due time, unless they were edited since the claim."""
+        try:
+            async with AsyncSessionLocal() as db:
+                # Core UPDATE on the table: the ORM form would treat the parameter list as a bulk update by primary key
+                reminders = Reminder.__table__
+                await db.execute(
+                    update(reminders)
+                    .where(reminders.c.id == bindparam("row_id"), reminders.c.next_fire_at == bindparam("claimed"))
+                    .values(next_fire_at=bindparam("due"), last_fired_at=bindparam("last_fired"), updated_at=reminders.c.updated_at),
+                    claimed,
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("Could not release %d undelivered reminders; they fire at their next occurrence", len(claimed))
+
+    def lag_seconds(self) -> float:
+        if not self.heap:
+            return 0.0
+        return max(0.0, (datetime.utcnow() - self.heap[0][0]).total_seconds())
+
+    def samples(self):
+        return [
+            ("reminder_scheduler_heap_size", "gauge", "Reminders loaded and waiting to fire.", len(self.heap)),
+            ("reminder_scheduler_lag_seconds", "gauge", "How overdue the oldest waiting reminder is.", self.lag_seconds()),
+            ("reminders_dispatched_total", "counter", "Reminders handed to the sink.", self.dispatched),
+            ("reminders_expired_total", "counter", "Reminders skipped because they were more than REMINDER_MAX_LATENESS_SECONDS late.", self.expired),
+            ("reminders_failed_total", "counter", "Reminder deliveries that failed and were retried.", self.failed),
+        ]
+
+def default_sink() -> ReminderSink:
+    return WebhookSink(REMINDER_WEBHOOK_URL) if REMINDER_WEBHOOK_URL else LogSink()
+
+reminder_scheduler = ReminderScheduler(
+    default_sink(), REMINDER_TICK_SECONDS, REMINDER_LOOKAHEAD_SECONDS,
+    REMINDER_BATCH_SIZE, REMINDER_MAX_LATENESS_SECONDS, REMINDER_RETRY_SECONDS,
+)
+
+def set_reminder_sink(sink: ReminderSink):
+    reminder_scheduler.sink = sink
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, computed_field, field_validator, model_validator
+from typing import Literal, Optional
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 # User Schema (for registration)
 class UserCreate(BaseModel):
@@ -20,8 +22,12 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UserRoleUpdate(BaseModel):
+    role: str = Field(..., pattern="^(user|admin)$", description="Either 'user' or 'admin'.")
+
 class TokenResponse(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str
 
 class TokenData(BaseModel):
@@ -40,10 +46,162 @@ class HabitUpdate(BaseModel):
     description: Optional[str] = Field(None, min_length=5)
     frequency: Optional[str] = Field(None, description="Update the habit frequency.")
 
+class HabitStatsResponse(BaseModel):
+    current_streak: int = 0
+    longest_streak: int = 0
+    last_completed_on: Optional[date] = None
+    total_completions: int = 0
+
+    class Config:
+        from_attributes = True
+
+    # The stored streak only counts while the habit was checked in today or yesterday
+    @model_validator(mode="after")
+    def expire_current_streak(self):
+        today = datetime.utcnow().date()
+        if self.last_completed_on is None or self.last_completed_on < today - timedelta(days=1):
+            self.current_streak = 0
+        return self
+
 class HabitResponse(HabitBase):
     id: int
     user_id: int
     frequency: str
+    stats: Optional[HabitStatsResponse] = None
+
+    class Config:
+        from_attributes = True
+
+# Bulk Habit Schemas
+BULK_MAX_ITEMS = 500
+BulkMode = Literal["atomic", "partial"]
+
+class HabitBulkCreate(BaseModel):
+    items: list[HabitCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+    mode: BulkMode = Field(default="atomic", description="'atomic' rolls back everything on any failure; 'partial' applies what it can.")
+
+class HabitBulkUpdateItem(HabitUpdate):
+    id: int
+
+class HabitBulkUpdate(BaseModel):
+    items: list[HabitBulkUpdateItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+    mode: BulkMode = "atomic"
+
+class HabitBulkDelete(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+    mode: BulkMode = "atomic"
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: Literal["created", "updated", "deleted", "error"]
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[BulkItemResult]
+
+# Habit Completion Schemas
+class CompletionCreate(BaseModel):
+    day: Optional[date] = Field(default=None, description="Day of the check-in (defaults to today, UTC).")
+
+class CompletionResponse(BaseModel):
+    habit_id: int
+    day: date
+
+    class Config:
+        from_attributes = True
+
+class StreakResponse(HabitStatsResponse):
+    habit_id: int
+
+# Reminder Schemas
+def validate_timezone(value: Optional[str]) -> Optional[str]:
+    if value is not None:
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone: {value}")
+    return value
+
+class ReminderCreate(BaseModel):
+    habit_id: int
+    time_of_day: time = Field(..., description="Local time of day to send the reminder (HH:MM).")
+    timezone: str = Field(default="UTC", description="IANA time zone, e.g. Europe/Berlin.")
+    enabled: bool = True
+
+    _check_timezone = field_validator("timezone")(validate_timezone)
+
+class ReminderUpdate(BaseModel):
+    time_of_day: Optional[time] = None
+    timezone: Optional[str] = None
+    enabled: Optional[bool] = None
+
+    _check_timezone = field_validator("timezone")(validate_timezone)
+
+class ReminderResponse(BaseModel):
+    id: int
+    habit_id: int
+    time_of_day: time
+    timezone: str
+    enabled: bool
+    next_fire_at: Optional[datetime] = None
+    last_fired_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Analytics Schemas
+class RollupResponse(BaseModel):
+    period_start: date
+    frequency: str
+    active_users: int
+    active_habits: int
+    completions: int
+    habits_created: int
+    total_habits: int
+
+    class Config:
+        from_attributes = True
+
+    @computed_field
+    @property
+    def completion_rate(self) -> float:
+        """Share of habits checked in at least once during the period."""
+        return round(self.active_habits / self.total_habits, 4) if self.total_habits else 0.0
+
+class RollupStatusResponse(BaseModel):
+    high_water_mark: Optional[datetime] = None
+
+# Bulk Import Schemas
+class HabitImportRow(HabitCreate):
+    """One row of an import file: a habit and, optionally, check-ins for it."""
+    external_id: Optional[str] = Field(None, min_length=1, max_length=200, description="Id in the source tracker (defaults to the title).")
+    username: Optional[str] = Field(None, description="Owner; only honoured for admins and the CLI.")
+    created_at: Optional[datetime] = None
+    day: Optional[date] = Field(None, description="A single check-in day.")
+    completions: list[date] = Field(default_factory=list, description="Check-in days.")
+
+class ImportJobResponse(BaseModel):
+    id: int
+    filename: Optional[str] = None
+    format: str
+    status: str
+    rows_read: int
+    rows_failed: int
+    habits_created: int
+    completions_created: int
+    message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ImportRowErrorResponse(BaseModel):
+    line: int
+    error: str
 
     class Config:
         from_attributes = True
@@ -0,0 +1,28 @@
+"""
+Process-wide settings read from the environment.
+
+`.env` is loaded here, once, and every module that reads settings imports this module
+before its first os.getenv (database.py does so for the CLIs and Alembic as well).
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# JWTs issued and verified by main.py
+JWT_SECRET = os.getenv("JWT_SECRET_KEY")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:5173").split(",")
+
+# OAuth login (see oauth.py)
+BASE_URL = os.getenv("BASE_URL")
+FRONTEND_URL = os.getenv("FRONTEND_URL")
+STATE_SECRET = os.getenv("STATE_SECRET")
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
+GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
+# Base URL of a local mock provider (python -m mock_oauth); replaces Google and GitHub when set
+OAUTH_MOCK_URL = os.getenv("OAUTH_MOCK_URL")
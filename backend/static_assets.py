@@ -0,0 +1,241 @@
+"""
+In-memory, precompressed serving of the bundled frontend.
+
+Every file under the directory is loaded once, with gzip and (if the `brotli` package is
+installed) brotli variants. Variants written ahead of time by
+
+    python -m static_assets build [directory]
+
+are used as-is. Without them the files are compressed at startup at a faster level.
+Responses pick the best encoding from Accept-Encoding. Content-hashed files (Vite's
+`name-<hash>.js`) are cached as immutable. Everything else, index.html included, is
+revalidated with its ETag. Range, If-Range, If-None-Match and If-Modified-Since are
+honoured.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Vite's output under assets/: <name>-<8-character content hash>.<ext>. Anything else revalidates.
+HASHED_NAME = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.(js|css|mjs|woff2?|png|jpe?g|gif|svg|webp|avif)$")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml", "application/wasm")
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# (encoding, file suffix) in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+BUILD_LEVELS = {"br": 11, "gzip": 9}
+STARTUP_LEVELS = {"br": 5, "gzip": 6}
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def available_encodings() -> list:
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != "br" or brotli is not None]
+
+def is_compressible(media_type: str, size: int) -> bool:
+    return size >= MIN_COMPRESS_BYTES and media_type.startswith(COMPRESSIBLE_TYPES)
+
+@dataclass
+class Asset:
+    media_type: str
+    last_modified: float
+    cache_control: str
+    # encoding ("identity", "gzip", "br") -> (body, etag)
+    variants: dict = field(default_factory=dict)
+
+    @property
+    def last_modified_header(self) -> str:
+        return formatdate(self.last_modified, usegmt=True)
+
+def load_asset(path: str, relative: str) -> Asset:
+    with open(path, "rb") as f:
+        data = f.read()
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+    mtime = os.stat(path).st_mtime
+    digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+    asset = Asset(media_type, mtime, IMMUTABLE if HASHED_NAME.search(relative) else REVALIDATE)
+    asset.variants["identity"] = (data, f'"{digest}"')
+
+    if is_compressible(media_type, len(data)):
+        for encoding, suffix in available_encodings():
+            prebuilt = path + suffix
+            if os.path.exists(prebuilt) and os.stat(prebuilt).st_mtime >= mtime:
+                with open(prebuilt, "rb") as f:
+                    body = f.read()
+            else:
+                body = compress(data, encoding, STARTUP_LEVELS[encoding])
+            # Keep a variant only if it actually saves bytes
+            if len(body) < len(data) * 0.9:
+                asset.variants[encoding] = (body, f'"{digest}-{encoding}"')
+    return asset
+
+def iter_files(directory: str):
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(suffixes):
+                path = os.path.join(root, name)
+                yield path, os.path.relpath(path, directory).replace(os.sep, "/")
+
+# -----------------------------
+# Request handling
+# -----------------------------
+def parse_accept_encoding(header: str) -> dict:
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+def choose_encoding(asset: Asset, header: Optional[str]) -> str:
+    if not header or len(asset.variants) == 1:
+        return "identity"
+    accepted = parse_accept_encoding(header)
+    for encoding, _ in ENCODINGS:
+        if encoding in asset.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+def etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+def not_modified_since(header: str, last_modified: float) -> bool:
+    try:
+        return int(last_modified) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+def parse_range(header: str, size: int):
+    """Return (start, end) inclusive for a single `bytes=` range, None to ignore it, or "invalid"."""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None  # multipart ranges are not supported; serve the whole file
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                return "invalid"
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+def asset_response(asset: Asset, method: str, headers) -> Response:
+    range_header = headers.get("range")
+    if_range = headers.get("if-range")
+    use_range = range_header is not None and (if_range is None or if_range.strip() == asset.variants["identity"][1])
+    # Ranges address the identity bytes, so a range request is never compressed
+    encoding = "identity" if use_range else choose_encoding(asset, headers.get("accept-encoding"))
+    body, etag = asset.variants[encoding]
+
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": asset.last_modified_header,
+        "Cache-Control": asset.cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if len(asset.variants) > 1:
+        response_headers["Vary"] = "Accept-Encoding"
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=response_headers)
+    elif headers.get("if-modified-since") and not_modified_since(headers["if-modified-since"], asset.last_modified):
+        return Response(status_code=304, headers=response_headers)
+
+    status_code = 200
+    if use_range:
+        byte_range = parse_range(range_header, len(body))
+        if byte_range == "invalid":
+            return Response(status_code=416, headers={**response_headers, "Content-Range": f"bytes */{len(body)}"})
+        if byte_range is not None:
+            start, end = byte_range
+            response_headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            body, status_code = body[start:end + 1], 206
+
+    response_headers["Content-Length"] = str(len(body))
+    return Response(b"" if method == "HEAD" else body, status_code=status_code, headers=response_headers, media_type=asset.media_type)
+
+class StaticAssets:
+    """ASGI app serving a directory from memory; a drop-in for StaticFiles(directory, html=True)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets = {relative: load_asset(path, relative) for path, relative in iter_files(directory)}
+
+    def response(self, path: str, method: str, headers) -> Response:
+        path = path.lstrip("/")
+        if path == "" or path.endswith("/"):
+            path += "index.html"
+        asset = self.assets.get(path)
+        if asset is None:
+            return Response("Not Found", status_code=404, media_type="text/plain")
+        return asset_response(asset, method, headers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = Response("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"}, media_type="text/plain")
+        else:
+            # Under a Mount, root_path ends with the mount prefix
+            path, root_path = scope["path"], scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            response = self.response(path, scope["method"], Headers(scope=scope))
+        await response(scope, receive, send)
+
+def build(directory: str) -> int:
+    """Write `.gz` and `.br` files next to every compressible file, at maximum compression."""
+    written = 0
+    for path, _ in iter_files(directory):
+        media_type = mimetypes.guess_type(path)[0] or ""
+        size = os.path.getsize(path)
+        if not is_compressible(media_type, size):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        for encoding, suffix in available_encodings():
+            with open(path + suffix, "wb") as f:
+                f.write(compress(data, encoding, BUILD_LEVELS[encoding]))
+            written += 1
+    return written
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        raise SystemExit("usage: python -m static_assets build [directory]")
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+    print(f"Wrote {build(target)} precompressed file(s) under {target}" + ("" if brotli else " (install brotli for .br files)"))
@@ -0,0 +1,167 @@
+import argparse
+from datetime import date, timedelta
+from sqlalchemy import Integer, delete, func, insert, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from models import Habit, HabitCompletion, HabitStats
+
+EPOCH = date(1970, 1, 1)
+REBUILD_BATCH_SIZE = 1000
+
+class day_ordinal(FunctionElement):
+    """Days since 1970-01-01 for a DATE column, so consecutive days differ by exactly 1."""
+    type = Integer()
+    inherit_cache = True
+
+@compiles(day_ordinal)
+def compile_day_ordinal(element, compiler, **kw):
+    return "(%s - DATE '1970-01-01')" % compiler.process(element.clauses, **kw)
+
+@compiles(day_ordinal, "sqlite")
+def compile_day_ordinal_sqlite(element, compiler, **kw):
+    return "CAST(julianday(%s) - 2440587.5 AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+def habit_stats_query(habit_ids):
+    """
+    Per-habit stats computed from the completion log with a gaps-and-islands query.
+
+    Consecutive check-in days share the same `day - row_number()` value, so each island is
+    one streak. `current_streak` is the length of the latest island; whether it is still
+    alive today is decided at read time from `last_completed_on`.
+    `habit_ids` may be a list or a scalar subquery of habit ids.
+    """
+    ordinal = day_ordinal(HabitCompletion.day)
+    islands = (
+        select(
+            HabitCompletion.habit_id.label("habit_id"),
+            HabitCompletion.day.label("day"),
+            (ordinal - func.row_number().over(partition_by=HabitCompletion.habit_id, order_by=HabitCompletion.day)).label("grp"),
+        )
+        .where(HabitCompletion.habit_id.in_(habit_ids))
+        .subquery()
+    )
+    runs = (
+        select(
+            islands.c.habit_id,
+            func.count().label("length"),
+            func.max(islands.c.day).label("last_day"),
+        )
+        .group_by(islands.c.habit_id, islands.c.grp)
+        .subquery()
+    )
+    ranked = select(
+        runs,
+        func.first_value(runs.c.length).over(partition_by=runs.c.habit_id, order_by=runs.c.last_day.desc()).label("latest_length"),
+    ).subquery()
+    return select(
+        ranked.c.habit_id,
+        func.max(ranked.c.latest_length).label("current_streak"),
+        func.max(ranked.c.length).label("longest_streak"),
+        func.max(ranked.c.last_day).label("last_completed_on"),
+        func.sum(ranked.c.length).label("total_completions"),
+    ).group_by(ranked.c.habit_id)
+
+def empty_stats(habit_id: int) -> dict:
+    return {"habit_id": habit_id, "current_streak": 0, "longest_streak": 0, "last_completed_on": None, "total_completions": 0}
+
+def is_streak_alive(last_completed_on, today: date) -> bool:
+    return last_completed_on is not None and last_completed_on >= today - timedelta(days=1)
+
+# -----------------------------
+# Incremental maintenance (runs inside the check-in/undo transaction)
+# -----------------------------
+async def get_stats_for_update(db, habit_id: int) -> HabitStats:
+    result = await db.execute(select(HabitStats).where(HabitStats.habit_id == habit_id).with_for_update())
+    stats = result.scalars().first()
+    if stats is None:
+        stats = HabitStats(**empty_stats(habit_id))
+        db.add(stats)
+    return stats
+
+async def recompute_stats(db, stats: HabitStats):
+    result = await db.execute(habit_stats_query([stats.habit_id]))
+    row = result.first()
+    values = row._asdict() if row else empty_stats(stats.habit_id)
+    for key, value in values.items():
+        setattr(stats, key, value)
+
+async def apply_completion(db, habit_id: int, day: date) -> HabitStats:
+    stats = await get_stats_for_update(db, habit_id)
+    last = stats.last_completed_on
+    if last is None or day > last:
+        # Fast path: appending the newest check-in extends or restarts the current streak
+        stats.current_streak = stats.current_streak + 1 if last == day - timedelta(days=1) else 1
+        stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+        stats.last_completed_on = day
+        stats.total_completions += 1
+    else:
+        # A backfilled day can merge two islands, so recompute this habit in SQL
+        await db.flush()
+        await recompute_stats(db, stats)
+    return stats
+
+async def apply_undo(db, habit_id: int) -> HabitStats:
+    stats = await get_stats_for_update(db, habit_id)
+    await db.flush()
+    await recompute_stats(db, stats)
+    return stats
+
+# -----------------------------
+# Consistency check and bulk rebuild (sync, for the CLI)
+# -----------------------------
+def iter_habit_id_batches(db, batch_size: int):
+    last_id = 0
+    while True:
+        ids = db.execute(select(Habit.id).where(Habit.id > last_id).order_by(Habit.id).limit(batch_size)).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+def compute_batch(db, ids) -> dict:
+    expected = {habit_id: empty_stats(habit_id) for habit_id in ids}
+    for row in db.execute(habit_stats_query(ids)):
+        expected[row.habit_id] = row._asdict()
+    return expected
+
+def check_stats(db, batch_size: int = REBUILD_BATCH_SIZE) -> list:
+    """Return the ids of habits whose stored stats differ from the completion log."""
+    drifted = []
+    for ids in iter_habit_id_batches(db, batch_size):
+        expected = compute_batch(db, ids)
+        stored = {
+            row.habit_id: {key: getattr(row, key) for key in empty_stats(row.habit_id)}
+            for row in db.execute(select(HabitStats).where(HabitStats.habit_id.in_(ids))).scalars()
+        }
+        drifted.extend(habit_id for habit_id in ids if stored.get(habit_id) != expected[habit_id])
+    return drifted
+
+def rebuild_batch(db, ids) -> int:
+    """Replace the stats of the given habits with values computed from the completion log."""
+    rows = list(compute_batch(db, ids).values())
+    db.execute(delete(HabitStats).where(HabitStats.habit_id.in_(ids)))
+    db.execute(insert(HabitStats), rows)
+    return len(rows)
+
+def rebuild_stats(db, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Recompute every habit's stats in batches, committing once per batch."""
+    total = 0
+    for ids in iter_habit_id_batches(db, batch_size):
+        total += rebuild_batch(db, ids)
+        db.commit()
+    return total
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Check or rebuild the per-habit stats table.")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "check":
+            drifted = check_stats(db, args.batch_size)
+            print(f"{len(drifted)} habit(s) with drifted stats" + (f": {drifted[:50]}" if drifted else ""))
+            raise SystemExit(1 if drifted else 0)
+        print(f"Rebuilt stats for {rebuild_stats(db, args.batch_size)} habit(s)")
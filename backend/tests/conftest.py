@@ -0,0 +1,68 @@
+"""
+Shared setup for the backend tests. Run from backend/:  python -m pytest -q
+
+Settings are read and engines created when the app is imported, so the environment is set
+here first. The primary and one read replica are SQLite files in a temporary directory
+(nothing replicates between them; tests copy rows across when they need to). Social logins
+go to the local mock provider instead of Google and GitHub.
+"""
+import os
+import sys
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="habit-tracker-tests-")
+PRIMARY_URL = f"sqlite:///{DATA_DIR}/primary.db"
+REPLICA_URL = f"sqlite:///{DATA_DIR}/replica.db"
+
+os.environ.update(
+    DATABASE_URL=PRIMARY_URL,
+    DATABASE_REPLICA_URLS=REPLICA_URL,
+    JWT_SECRET_KEY="test-secret",
+    OAUTH_MOCK_URL="http://mock-oauth",
+    BASE_URL="http://testserver",
+    FRONTEND_URL="http://frontend",
+    RATE_LIMIT_ENABLED="false",
+    REMINDER_SCHEDULER_ENABLED="false",
+    ROLLUP_JOB_ENABLED="false",
+)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select
+import cache
+import database
+import models
+import replicas
+from main import app
+
+replica_engine = create_engine(REPLICA_URL)
+
+@pytest.fixture(autouse=True)
+def fresh_databases():
+    for bind in (database.engine, replica_engine):
+        models.Base.metadata.drop_all(bind)
+        models.Base.metadata.create_all(bind)
+    cache.user_cache.clear()
+    replicas.recent_writers.clear()
+    yield
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def register(client, username: str, password: str = "password123") -> dict:
+    """Create a user and return bearer headers for them."""
+    client.post("/users/register", json={"username": username, "password": password})
+    token = client.post("/users/login", json={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def replicate(*tables):
+    """Copy the given tables from the primary to the replica, like replication catching up."""
+    with database.engine.connect() as source, replica_engine.begin() as target:
+        for table in tables:
+            rows = [row._asdict() for row in source.execute(select(table))]
+            target.execute(table.delete())
+            if rows:
+                target.execute(insert(table), rows)
@@ -0,0 +1,121 @@
+from sqlalchemy import select, update
+import cache
+import database
+import streaks
+from models import Habit, User
+from conftest import register
+
+CSV = (
+    "title,description,external_id,completions\n"
+    "Read,Twenty pages a day,read,2024-01-01;2024-01-02;2024-01-03\n"
+    "Run,Five kilometres,run,2024-01-02\n"
+)
+NDJSON = (
+    b'{"title": "Read", "description": "Twenty pages a day", "completions": ["2024-01-01", "2024-01-02"]}\n'
+    b'{"title": "Stretch", "description": "Ten minutes", "day": "2024-01-05"}\n'
+)
+
+def upload(client, headers, content, filename="habits.csv"):
+    # TestClient runs the background import before returning, so the job is already finished
+    response = client.post("/imports", files={"file": (filename, content)}, headers=headers)
+    assert response.status_code == 202
+    return client.get(f"/imports/{response.json()['id']}", headers=headers).json()
+
+def habits_by_title(client, headers) -> dict:
+    response = client.get("/habits", headers=headers)
+    assert response.status_code == 200
+    return {habit["title"]: habit for habit in response.json()}
+
+def test_csv_import_creates_habits_and_check_ins(client):
+    headers = register(client, "alice")
+
+    job = upload(client, headers, CSV)
+
+    assert (job["status"], job["rows_read"], job["rows_failed"]) == ("done", 2, 0)
+    assert (job["habits_created"], job["completions_created"]) == (2, 4)
+    habits = habits_by_title(client, headers)
+    assert habits["Read"]["stats"]["longest_streak"] == 3
+    assert habits["Read"]["stats"]["total_completions"] == 3
+    assert habits["Run"]["stats"]["total_completions"] == 1
+
+def test_ndjson_import_creates_habits_and_check_ins(client):
+    headers = register(client, "alice")
+
+    job = upload(client, headers, NDJSON, "habits.ndjson")
+
+    assert (job["format"], job["status"], job["rows_failed"]) == ("ndjson", "done", 0)
+    assert (job["habits_created"], job["completions_created"]) == (2, 3)
+    assert sorted(habits_by_title(client, headers)) == ["Read", "Stretch"]
+
+def test_reimport_creates_nothing(client):
+    headers = register(client, "alice")
+    upload(client, headers, CSV)
+
+    job = upload(client, headers, CSV)
+
+    assert (job["status"], job["habits_created"], job["completions_created"]) == ("done", 0, 0)
+    assert len(habits_by_title(client, headers)) == 2
+
+def test_invalid_rows_are_stored_with_their_line(client):
+    headers = register(client, "alice")
+    content = (
+        b'{"title": "Read", "description": "Twenty pages a day"}\n'
+        b'{"title": "Broken"\n'
+        b'["not", "an", "object"]\n'
+        b'{"title": "Run", "description": "Five kilometres", "day": "not a date"}\n'
+    )
+
+    job = upload(client, headers, content, "habits.ndjson")
+
+    assert (job["status"], job["rows_read"], job["rows_failed"], job["habits_created"]) == ("done", 4, 3, 1)
+    errors = client.get(f"/imports/{job['id']}/errors", headers=headers).json()
+    assert [error["line"] for error in errors] == [2, 3, 4]
+    assert errors[0]["error"].startswith("Invalid JSON")
+    assert errors[1]["error"] == "Expected a JSON object"
+    assert errors[2]["error"].startswith("day:")
+
+def test_username_is_rejected_for_non_admins(client):
+    register(client, "bob")
+    headers = register(client, "alice")
+
+    job = upload(client, headers, b'{"title": "Read", "description": "Twenty pages a day", "username": "bob"}\n', "habits.ndjson")
+
+    assert (job["rows_failed"], job["habits_created"]) == (1, 0)
+    errors = client.get(f"/imports/{job['id']}/errors", headers=headers).json()
+    assert errors == [{"line": 1, "error": "username: only admins can import habits for other users"}]
+
+def test_username_assigns_rows_for_admins(client):
+    register(client, "bob")
+    admin = register(client, "admin")
+    with database.engine.begin() as conn:
+        conn.execute(update(User).where(User.username == "admin").values(role="admin"))
+    cache.user_cache.clear()
+
+    job = upload(client, admin, b'{"title": "Read", "description": "Twenty pages a day", "username": "bob"}\n', "habits.ndjson")
+
+    assert (job["rows_failed"], job["habits_created"]) == (0, 1)
+    # Bob has not written anything, so his reads would go to the replica; check the primary
+    with database.engine.connect() as conn:
+        owners = conn.execute(select(User.username).join(Habit, Habit.user_id == User.id)).scalars().all()
+    assert owners == ["bob"]
+
+def test_import_changes_the_habits_etag(client):
+    headers = register(client, "alice")
+    etag = client.get("/habits", headers=headers).headers["ETag"]
+
+    upload(client, headers, CSV)
+
+    response = client.get("/habits", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_habit_without_check_ins_gets_empty_stats(client):
+    headers = register(client, "alice")
+
+    upload(client, headers, b'{"title": "Bike", "description": "no checkins yet"}\n', "habits.ndjson")
+
+    stats = habits_by_title(client, headers)["Bike"]["stats"]
+    assert stats == {"current_streak": 0, "longest_streak": 0, "last_completed_on": None, "total_completions": 0}
+    assert len(client.get("/habits/streaks", headers=headers).json()) == 1
+    with database.SessionLocal() as db:
+        assert streaks.check_stats(db) == []
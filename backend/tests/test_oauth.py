@@ -0,0 +1,95 @@
+from urllib.parse import parse_qs, urlsplit
+import httpx
+import pytest
+from sqlalchemy import select
+import database
+import http_client
+from hashing import UNUSABLE_PASSWORD
+from mock_oauth import create_mock_provider
+from models import User
+from conftest import register
+
+STATE = "test-state"
+
+@pytest.fixture(autouse=True)
+def mock_provider():
+    # OAUTH_MOCK_URL (conftest) points the providers at http://mock-oauth, served in process
+    http_client.set_http_transport(httpx.ASGITransport(app=create_mock_provider()))
+    yield
+    http_client.set_http_transport(None)
+
+def callback(client, provider: str, login: str):
+    return client.get(
+        f"/auth/{provider}/callback",
+        params={"code": f"mock-{login}", "state": STATE},
+        cookies={"oauth_state": STATE},
+        follow_redirects=False,
+    )
+
+def issued_token(response) -> str:
+    assert response.status_code == 307
+    return parse_qs(urlsplit(response.headers["location"]).query)["token"][0]
+
+def users():
+    with database.engine.connect() as conn:
+        return conn.execute(select(User.username, User.password, User.role).order_by(User.id)).all()
+
+def test_login_redirects_to_the_provider_with_state(client):
+    response = client.get("/auth/github/login", follow_redirects=False)
+    assert response.status_code == 302
+    location = urlsplit(response.headers["location"])
+    assert (location.hostname, location.path) == ("mock-oauth", "/github/authorize")
+    assert parse_qs(location.query)["state"] == [response.cookies["oauth_state"]]
+
+@pytest.mark.parametrize("provider", ["github", "google"])
+def test_first_login_creates_the_user(client, provider):
+    token = issued_token(callback(client, provider, "alice"))
+
+    assert users() == [("alice@example.test", UNUSABLE_PASSWORD, "user")]
+    me = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.json()["username"] == "alice@example.test"
+
+def test_returning_user_is_not_duplicated(client):
+    # Twice through GitHub, then the same verified email through Google
+    tokens = [issued_token(callback(client, provider, "alice")) for provider in ("github", "github", "google")]
+
+    assert users() == [("alice@example.test", UNUSABLE_PASSWORD, "user")]
+    ids = {client.get("/users/me", headers={"Authorization": f"Bearer {token}"}).json()["id"] for token in tokens}
+    assert len(ids) == 1
+
+def test_password_account_is_left_untouched(client):
+    register(client, "bob@example.test")
+    before = users()
+
+    response = callback(client, "github", "bob")
+
+    assert response.status_code == 409
+    assert users() == before
+    assert before[0].password != UNUSABLE_PASSWORD
+    login = client.post("/users/login", json={"username": "bob@example.test", "password": "password123"})
+    assert login.status_code == 200
+
+def test_oauth_account_has_no_usable_password(client):
+    issued_token(callback(client, "github", "alice"))
+    response = client.post("/users/login", json={"username": "alice@example.test", "password": UNUSABLE_PASSWORD})
+    assert response.status_code == 401
+
+def test_state_mismatch_is_rejected(client):
+    response = client.get(
+        "/auth/github/callback",
+        params={"code": "mock-alice", "state": "forged"},
+        cookies={"oauth_state": STATE},
+        follow_redirects=False,
+    )
+    assert response.status_code == 400
+    assert users() == []
+
+def test_rejected_code_is_a_bad_request(client):
+    response = client.get(
+        "/auth/github/callback",
+        params={"code": "not-issued", "state": STATE},
+        cookies={"oauth_state": STATE},
+        follow_redirects=False,
+    )
+    assert response.status_code == 400
+    assert users() == []
@@ -0,0 +1,74 @@
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+import database
+import replicas
+from models import Habit, HabitStats, User
+from conftest import register, replica_engine, replicate
+
+def habit_titles(client, headers) -> list:
+    response = client.get("/habits", headers=headers)
+    assert response.status_code == 200
+    return sorted(habit["title"] for habit in response.json())
+
+def add_replica_only_habit(title: str):
+    """A row only the replica has, so a response containing it must have been read there."""
+    with replica_engine.begin() as conn:
+        user_id = conn.execute(select(User.id)).scalar()
+        conn.execute(insert(Habit).values(title=title, description="replica", user_id=user_id))
+
+def test_reads_go_to_the_replica(client):
+    headers = register(client, "alice")
+    replicate(User.__table__)
+    add_replica_only_habit("From replica")
+    served = replicas.replica_router.replicas[0].served
+
+    assert habit_titles(client, headers) == ["From replica"]
+    assert replicas.replica_router.replicas[0].served == served + 1
+
+def test_writes_go_to_the_primary(client):
+    headers = register(client, "alice")
+    replicate(User.__table__)
+
+    response = client.post("/habits/", json={"title": "Written", "description": "to the primary"}, headers=headers)
+    assert response.status_code == 200
+
+    with database.engine.connect() as primary:
+        assert primary.execute(select(Habit.title)).scalars().all() == ["Written"]
+    with replica_engine.connect() as replica:
+        assert replica.execute(select(Habit.title)).scalars().all() == []
+
+def test_reads_stick_to_the_primary_after_a_write(client):
+    alice = register(client, "alice")
+    bob = register(client, "bob")
+    replicate(User.__table__)
+
+    client.post("/habits/", json={"title": "Fresh", "description": "not replicated yet"}, headers=alice)
+    # Within DB_STICKY_SECONDS the writer reads back their own write from the primary...
+    assert habit_titles(client, alice) == ["Fresh"]
+    # ...while other users keep reading from the replica
+    add_replica_only_habit("From replica")
+    bob_id = client.get("/users/me", headers=bob).json()["id"]
+    with replica_engine.begin() as conn:
+        conn.execute(Habit.__table__.update().values(user_id=bob_id))
+    assert habit_titles(client, bob) == ["From replica"]
+
+    # Once the window has passed, the writer is back on the (now caught up) replica
+    replicas.recent_writers.clear()
+    replicate(User.__table__, Habit.__table__, HabitStats.__table__)
+    add_replica_only_habit("Replicated later")
+    assert "Replicated later" in habit_titles(client, alice)
+
+def test_unreachable_replica_falls_back_to_the_primary(client, monkeypatch):
+    headers = register(client, "alice")
+    client.post("/habits/", json={"title": "On primary", "description": "only here"}, headers=headers)
+    replicas.recent_writers.clear()
+
+    replica = replicas.replica_router.replicas[0]
+    broken = create_async_engine(f"sqlite+aiosqlite:///{database.DATABASE_URL.rsplit('/', 1)[0]}/missing/replica.db")
+    monkeypatch.setattr(replica, "sessionmaker", replicas.async_sessionmaker(broken, class_=replicas.AsyncSession))
+    monkeypatch.setattr(replica, "down_until", 0.0)
+    failovers = replicas.replica_router.failovers
+
+    assert habit_titles(client, headers) == ["On primary"]
+    assert replicas.replica_router.failovers == failovers + 1
+    assert replica.down_until > 0
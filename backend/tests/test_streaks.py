@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+import pytest
+import database
+import streaks
+from models import HabitStats
+from conftest import register
+
+START = date(2024, 3, 1)
+
+@pytest.fixture
+def habit(client):
+    headers = register(client, "alice")
+    response = client.post("/habits/", json={"title": "Read", "description": "Twenty pages a day"}, headers=headers)
+    return response.json()["id"], headers
+
+def check_in(client, habit, *offsets):
+    habit_id, headers = habit
+    for offset in offsets:
+        response = client.post(f"/habits/{habit_id}/completions", json={"day": str(START + timedelta(days=offset))}, headers=headers)
+        assert response.status_code == 201
+
+def undo(client, habit, offset):
+    habit_id, headers = habit
+    response = client.delete(f"/habits/{habit_id}/completions/{START + timedelta(days=offset)}", headers=headers)
+    assert response.status_code == 200
+
+def stored_stats(habit) -> tuple:
+    """(current, longest, last offset, total) as stored, which must also match the completion log."""
+    with database.SessionLocal() as db:
+        assert streaks.check_stats(db) == []
+        stats = db.get(HabitStats, habit[0])
+        return stats.current_streak, stats.longest_streak, (stats.last_completed_on - START).days, stats.total_completions
+
+def test_consecutive_check_ins_extend_the_streak(client, habit):
+    check_in(client, habit, 0, 1, 2)
+    assert stored_stats(habit) == (3, 3, 2, 3)
+
+def test_gap_restarts_the_current_streak(client, habit):
+    check_in(client, habit, 0, 1, 4)
+    assert stored_stats(habit) == (1, 2, 4, 3)
+
+def test_backfilled_day_merges_two_streaks(client, habit):
+    check_in(client, habit, 0, 1, 3, 4)
+    assert stored_stats(habit) == (2, 2, 4, 4)
+
+    check_in(client, habit, 2)
+    assert stored_stats(habit) == (5, 5, 4, 5)
+
+def test_undo_inside_a_streak_splits_it(client, habit):
+    check_in(client, habit, 0, 1, 2, 3, 4)
+
+    undo(client, habit, 2)
+    assert stored_stats(habit) == (2, 2, 4, 4)
+
+    undo(client, habit, 4)
+    assert stored_stats(habit) == (1, 2, 3, 3)
@@ -0,0 +1,67 @@
+"""
+Startup warm-up for single-process and pre-fork deployments.
+
+With a pre-fork server the app is imported once in the master and the workers share those
+pages copy-on-write. This module doubles as a gunicorn config, so its hooks are picked up with
+
+    gunicorn main:app -k uvicorn.workers.UvicornWorker -w 4 --preload -c python:warmup
+
+`pre_fork()` runs in the master. It does the process-safe part (the bcrypt backend self-test)
+and moves everything allocated so far out of the garbage collector's reach. Otherwise the first
+collection in each worker would touch, and so copy, every shared page. `post_fork()` drops any
+pooled connections inherited from the master, because a socket must not be shared between
+processes. `warm_up()` runs in every worker on startup. It opens WARMUP_DB_CONNECTIONS
+connections in the primary's and each replica's pool and loads the bcrypt backend, so the
+first requests do not pay for them.
+"""
+import asyncio
+import gc
+import logging
+import os
+import time
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+from database import DB_POOL_SIZE, async_engine, engine, replica_engines
+from routes.auth_utils import pwd_context
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", 2))
+
+def warm_password_hashing():
+    # passlib picks and self-tests the bcrypt backend on first use
+    pwd_context.handler().get_backend()
+
+async def warm_db_pool(pooled_engine, connections: int = WARMUP_DB_CONNECTIONS):
+    # Hold the connections at the same time so the pool really opens that many
+    async def ping():
+        async with pooled_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(0)
+
+    if isinstance(pooled_engine.pool, NullPool):
+        return  # nothing is kept between checkouts (e.g. aiosqlite)
+    await asyncio.gather(*(ping() for _ in range(min(connections, DB_POOL_SIZE))))
+
+async def warm_up():
+    started = time.perf_counter()
+    warm_password_hashing()
+    if WARMUP_DB_CONNECTIONS > 0:
+        for pooled_engine in (async_engine, *replica_engines):
+            try:
+                await warm_db_pool(pooled_engine)
+            except Exception:
+                # An unreachable database should fail requests, not keep the worker from starting
+                logger.exception("Database warm-up failed for %s", pooled_engine.url.render_as_string(hide_password=True))
+    logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000)
+
+def pre_fork(server=None, worker=None):
+    warm_password_hashing()
+    gc.collect()
+    gc.freeze()
+
+def post_fork(server=None, worker=None):
+    # Forget, without closing, connections the master may have opened (e.g. during --preload)
+    engine.dispose(close=False)
+    for pooled_engine in (async_engine, *replica_engines):
+        pooled_engine.sync_engine.dispose(close=False)